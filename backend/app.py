@@ -6,8 +6,12 @@ import os
 
 # Import routes
 from routes.auth import auth_bp
-from routes.books import books_bp
+from routes.books import books_bp, warm_caches
 from routes.reading_history import history_bp
+from routes.covers import covers_bp
+from utils.admission import admission
+from utils.database import db_instance
+from utils.readiness import readiness
 
 # Load environment variables
 load_dotenv()
@@ -35,7 +39,9 @@ def create_app():
                     "http://localhost:5000"
                 ],
                 "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-                "allow_headers": ["Content-Type", "Authorization"],
+                # Conditional and range headers let book bundles revalidate and resume
+                "allow_headers": ["Content-Type", "Authorization", "If-None-Match", "If-Range", "Range"],
+                "expose_headers": ["ETag", "Content-Range", "Accept-Ranges"],
                 "supports_credentials": True,
                 "vary_header": True
             }
@@ -51,10 +57,14 @@ def create_app():
             response.headers.add('Access-Control-Max-Age', '600')
             return response, 200
     
+    # Per-endpoint-class concurrency limits and load shedding
+    admission.init_app(app)
+    
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(books_bp, url_prefix='/api')
     app.register_blueprint(history_bp, url_prefix='/api')
+    app.register_blueprint(covers_bp, url_prefix='/api')
     
     # Error handlers
     @app.errorhandler(404)
@@ -92,6 +102,26 @@ def create_app():
             }
         }), 200
     
+    @app.route('/api/health/live', methods=['GET'])
+    def liveness_check():
+        # The process is up and serving; says nothing about its dependencies
+        return jsonify({'status': 'alive'}), 200
+    
+    @app.route('/api/health/ready', methods=['GET'])
+    def readiness_check():
+        database_ok = db_instance.ping()
+        ready = database_ok and readiness.ready
+        return jsonify({
+            'status': 'ready' if ready else 'not_ready',
+            'warm_up_state': readiness.state,
+            'database': 'connected' if database_ok else 'unavailable',
+            'warm_up': readiness.steps,
+            'ready_at': readiness.ready_at
+        }), 200 if ready else 503
+    
+    # Fill this worker's caches before it reports ready
+    readiness.warm_up(app, [('books', warm_caches)])
+    
     return app
 
 app = create_app()
@@ -135,6 +165,10 @@ def root():
             <div><a href="/api/health" target="_blank">Try it</a></div>
         </div>
         
+        <div class="endpoint">
+            <strong>GET /api/health/ready</strong> - Check whether this worker is connected and warmed up
+        </div>
+        
         <div class="endpoint">
             <strong>POST /api/auth/register</strong> - Register a new user
         </div>
@@ -0,0 +1,18 @@
+import argparse
+from utils.database import db
+from models.reading_history import ReadingHistory, COMPLETED_ARCHIVE_DAYS, INACTIVE_ARCHIVE_DAYS
+
+def main():
+    parser = argparse.ArgumentParser(description="Move completed and inactive reading history to the archive")
+    parser.add_argument("--completed-days", type=int, default=COMPLETED_ARCHIVE_DAYS,
+                        help="Archive completed books not opened for this many days")
+    parser.add_argument("--inactive-days", type=int, default=INACTIVE_ARCHIVE_DAYS,
+                        help="Archive any book not opened for this many days")
+    args = parser.parse_args()
+    
+    print("Archiving reading history...")
+    archived = ReadingHistory(db).archive_entries(args.completed_days, args.inactive_days)
+    print(f"Archived {archived} reading history entr{'y' if archived == 1 else 'ies'}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+from utils.database import db
+from models.reading_history import ReadingHistory
+
+def main():
+    print("Building recently-read lists from reading history...")
+    filled = ReadingHistory(db).backfill_recent_reads()
+    print(f"Created {filled} recently-read list(s).")
+
+if __name__ == "__main__":
+    main()
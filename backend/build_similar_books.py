@@ -0,0 +1,26 @@
+import argparse
+from utils.database import db
+from models.similar_books import SimilarBooks, TOP_K, MEMORY_BUDGET
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute similar-book recommendations")
+    parser.add_argument("--full", action="store_true", help="Rebuild term weights and all neighbor lists")
+    parser.add_argument("--top-k", type=int, default=TOP_K, help="Similar books kept per book")
+    parser.add_argument("--memory-mb", type=int, default=MEMORY_BUDGET // (1024 * 1024),
+                        help="Memory for one block of similarity scores")
+    args = parser.parse_args()
+    
+    similar_books = SimilarBooks(db)
+    memory_budget = args.memory_mb * 1024 * 1024
+    
+    if args.full:
+        print("Rebuilding similar books for the whole catalog...")
+        count = similar_books.rebuild(args.top_k, memory_budget)
+    else:
+        print("Computing similar books for new and updated books...")
+        count = similar_books.update_new(args.top_k, memory_budget)
+    
+    print(f"Similar books updated for {count} book(s).")
+
+if __name__ == "__main__":
+    main()
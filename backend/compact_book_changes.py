@@ -0,0 +1,22 @@
+import argparse
+from utils.database import db
+from models.book_changes import BookChanges, TOMBSTONE_RETENTION_DAYS
+
+def main():
+    parser = argparse.ArgumentParser(description="Purge old book tombstones used by catalog delta sync")
+    parser.add_argument("--retention-days", type=int, default=TOMBSTONE_RETENTION_DAYS,
+                        help="Keep tombstones of books deleted within this many days")
+    args = parser.parse_args()
+    
+    changes = BookChanges(db)
+    
+    backfilled = changes.backfill()
+    if backfilled:
+        print(f"Assigned change sequence numbers to {backfilled} existing book(s).")
+    
+    print("Compacting book tombstones...")
+    purged = changes.compact(args.retention_days)
+    print(f"Purged {purged} tombstone(s).")
+
+if __name__ == "__main__":
+    main()
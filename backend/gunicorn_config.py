@@ -1,6 +1,8 @@
+import os
+
 workers = 4
 worker_class = 'gthread'
-threads = 2
+threads = int(os.getenv('WEB_THREADS', 2))  # also read by utils/admission.py
 bind = '0.0.0.0:10000'
 timeout = 120
 keepalive = 5
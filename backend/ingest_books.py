@@ -0,0 +1,30 @@
+import argparse
+import os
+from utils.database import db
+from models.book import Book
+from utils.ingest import ingest_path
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load plain-text, EPUB and JSON books")
+    parser.add_argument("path", help="Directory or .zip/.tar.gz archive of books")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Parser processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Books per insert_many batch")
+    parser.add_argument("--progress-file", help="Resume file (default: <path>.ingest-progress)")
+    args = parser.parse_args()
+    
+    progress_file = args.progress_file or f"{args.path.rstrip('/')}.ingest-progress"
+    
+    summary = ingest_path(
+        Book(db), args.path,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        progress_file=progress_file
+    )
+    
+    print(f"Ingestion completed! {summary['inserted']} book(s) added, "
+          f"{summary['duplicates']} already present, {len(summary['errors'])} error(s).")
+    for error in summary["errors"]:
+        print(f"Error: {error}")
+
+if __name__ == "__main__":
+    main()
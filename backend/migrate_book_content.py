@@ -0,0 +1,64 @@
+from pymongo import ReturnDocument
+from utils.database import db
+from models.book import Book
+from models.book_changes import NOT_DELETED
+
+def migrate_book_content():
+    """Move inline book content into compressed, search-indexed content chunks"""
+    
+    book_model = Book(db)
+    
+    migrated = 0
+    for book in book_model.collection.find({"content": {"$exists": True}}, {"_id": 1}):
+        # Load one book at a time; legacy documents can be large
+        legacy = book_model.collection.find_one({"_id": book["_id"]}, {"content": 1, "title": 1})
+        content = legacy.get("content") or ""
+        
+        content_version, total_pages = book_model.content.save(book["_id"], content)
+        previous = book_model.collection.find_one_and_update(
+            {"_id": book["_id"]},
+            {
+                "$set": {
+                    "total_pages": total_pages,
+                    "content_version": content_version,
+                    "content_size": len(content.encode('utf-8'))
+                },
+                "$unset": {"content": ""}
+            },
+            projection={"content_version": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        book_model.content.delete_version(book["_id"], previous.get("content_version"))
+        migrated += 1
+        print(f"Migrated content for: {legacy.get('title')}")
+    
+    # Books stored before the in-book search index have no postings
+    for book in book_model.collection.find({"content": {"$exists": False}, **NOT_DELETED}, {"content_version": 1}):
+        book_id = book["_id"]
+        if book_model.content.has_postings(book_id, book.get("content_version")):
+            continue
+        content = book_model.content.get_content(book_id, book.get("content_version"))
+        content_version, _ = book_model.content.save(book_id, content)
+        previous = book_model.collection.find_one_and_update(
+            {"_id": book_id},
+            {"$set": {"content_version": content_version}},
+            projection={"content_version": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        if previous is None:
+            book_model.content.delete(book_id, content_version)
+            continue
+        book_model.content.delete_version(book_id, previous.get("content_version"))
+        migrated += 1
+        print(f"Rebuilt search index for book: {book_id}")
+    
+    # Replaced by book_postings; chunks no longer carry term lists
+    try:
+        book_model.content.collection.drop_index([("book_id", 1), ("terms", 1)])
+    except Exception:
+        pass
+    
+    print(f"Content migration completed! {migrated} book(s) updated.")
+
+if __name__ == "__main__":
+    migrate_book_content()
@@ -0,0 +1,30 @@
+from utils.database import db
+from models.book import Book
+
+def migrate_covers():
+    """Move covers embedded in existing book documents into the cover store"""
+    
+    book_model = Book(db)
+    
+    query = {
+        "cover_id": {"$exists": False},
+        "cover_image": {"$nin": ["", None]}
+    }
+    
+    migrated = 0
+    for book in book_model.collection.find(query, {"cover_image": 1, "title": 1}):
+        cover_id = book_model.covers.ingest(book["cover_image"])
+        if not cover_id:
+            continue
+        
+        book_model.collection.update_one(
+            {"_id": book["_id"]},
+            {"$set": {"cover_id": cover_id, "cover_image": ""}}
+        )
+        migrated += 1
+        print(f"Migrated cover for: {book.get('title')}")
+    
+    print(f"Cover migration completed! {migrated} book(s) updated.")
+
+if __name__ == "__main__":
+    migrate_covers()
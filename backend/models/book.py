@@ -1,33 +1,172 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument
+from pymongo.errors import BulkWriteError
 from bson import ObjectId
 from datetime import datetime
+import hashlib
+from models.cover import CoverStore, COVER_URL_PATTERN, with_cover_url, cover_urls_absolute
+from models.book_content import BookContent, split_pages, text_stats, READING_SPEEDS
+from models.book_facets import BookFacets, FACET_FIELDS
+from models.book_changes import BookChanges, NOT_DELETED
+from utils.cache import LRUCache
+from utils.catalog_index import catalog_index
+from utils.catalog_snapshot import catalog_snapshot
+
+# Result pages of get_all_books. Writes in this worker clear it; writes made
+# elsewhere show up once entries expire and the snapshot has caught up
+# (see FRESHNESS_CHECK_INTERVAL in utils.catalog_snapshot)
+listing_cache = LRUCache(maxsize=256, ttl=30)
+catalog_snapshot.on_reload(lambda snapshot: listing_cache.clear())
+
+# Fields left out of catalog listings
+LISTING_PROJECTION = {"content": 0, "content_version": 0, "similar_books": 0, "text_stats": 0}
+
+def book_version(book_id, updated_at):
+    """Version of a book's content and metadata; changes with every update"""
+    stamp = updated_at.isoformat() if updated_at else ""
+    return hashlib.sha256(f"{book_id}:{stamp}".encode('utf-8')).hexdigest()[:24]
 
 class Book:
     def __init__(self, db):
         self.collection = db.books
+        self.covers = CoverStore(db)
+        self.content = BookContent(db)
+        self.facets = BookFacets(db)
+        self.changes = BookChanges(db)
+        self.vectors = db.book_vectors
     
     def add_book(self, title, author, description, content, cover_image="", genre="", publication_date=None):
+        book_id = ObjectId()
+        
+        # Content is stored in compressed chunks, not in the book document
+        content_version, total_pages = self.content.save(book_id, content)
+        
         book_data = {
+            "_id": book_id,
             "title": title,
             "author": author,
             "description": description,
-            "content": content,
             "cover_image": cover_image,
             "genre": genre,
             "publication_date": publication_date or datetime.utcnow(),
-            "total_pages": len(content.split('\n\n')) if content else 1,  # Simple page calculation
+            "total_pages": total_pages,
+            "content_version": content_version,
+            "content_size": len(content.encode('utf-8')) if content else 0,
+            "text_stats": text_stats(content),
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
+        self._store_cover(book_data)
         
-        result = self.collection.insert_one(book_data)
-        return str(result.inserted_id)
+        book_data["change_seq"] = self.changes.reserve()
+        try:
+            self.collection.insert_one(book_data)
+        except Exception:
+            self.content.delete(book_id)
+            raise
+        finally:
+            self.changes.release(book_data["change_seq"])
+        
+        self.facets.add_books([book_data])
+        self._catalog_changed(book_data["change_seq"])
+        catalog_index.add_book(book_id, title, author)
+        return str(book_id)
     
-    def get_all_books(self, page=1, limit=10, search="", author_filter="", sort_by="updated_at"):
+    def add_books(self, prepared_books):
+        """Insert books prepared by `utils.ingest.prepare_record` in bulk.
+        
+        Books whose `source_key` already exists are skipped, which makes
+        re-running an interrupted ingestion safe.
+        """
+        now = datetime.utcnow()
+        books, chunks, postings = [], [], []
+        
+        for prepared in prepared_books:
+            book_data = {key: value for key, value in prepared.items() if key not in ("chunks", "postings")}
+            book_data.update({
+                "_id": ObjectId(),
+                "publication_date": prepared.get("publication_date") or now,
+                "total_pages": prepared["chunks"][-1]["last_page"],
+                "content_version": ObjectId(),
+                "created_at": now,
+                "updated_at": now
+            })
+            self._store_cover(book_data)
+            books.append(book_data)
+            chunks.extend(
+                dict(chunk, book_id=book_data["_id"], version=book_data["content_version"])
+                for chunk in prepared["chunks"]
+            )
+            postings.append({
+                "book_id": book_data["_id"],
+                "version": book_data["content_version"],
+                "data": prepared["postings"]
+            })
+        
+        if not books:
+            return {"inserted_ids": [], "duplicates": 0, "errors": []}
+        
+        # Content first, so a book is never visible without its text
+        self.content.collection.insert_many(chunks, ordered=False)
+        self.content.postings.insert_many(postings, ordered=False)
+        
+        first_seq = self.changes.reserve(len(books))
+        for offset, book_data in enumerate(books):
+            book_data["change_seq"] = first_seq + offset
+        
+        failed = {}
+        try:
+            self.collection.insert_many(books, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"]: error for error in e.details["writeErrors"]}
+        finally:
+            self.changes.release(first_seq)
+        
+        if failed:
+            failed_ids = [books[index]["_id"] for index in failed]
+            self.content.collection.delete_many({"book_id": {"$in": failed_ids}})
+            self.content.postings.delete_many({"book_id": {"$in": failed_ids}})
+        
+        inserted = [book for index, book in enumerate(books) if index not in failed]
+        self.facets.add_books(inserted)
+        self._catalog_changed(first_seq + len(books) - 1)
+        for book in inserted:
+            catalog_index.add_book(book["_id"], book["title"], book["author"])
+        
+        return {
+            "inserted_ids": [str(book["_id"]) for index, book in enumerate(books) if index not in failed],
+            "duplicates": sum(1 for error in failed.values() if error["code"] == 11000),
+            "errors": [
+                f"{books[index]['title']}: {error['errmsg']}"
+                for index, error in failed.items() if error["code"] != 11000
+            ]
+        }
+    
+    def get_all_books(self, page=1, limit=10, search="", author_filter="", sort_by="updated_at",
+                      genres=None, author_exact=""):
+        genres = sorted(genres or [])
+        cache_key = (page, limit, search, author_filter, sort_by, tuple(genres), author_exact)
+        
+        # Looked up first: mapping a newer snapshot clears listing_cache
+        snapshot = catalog_snapshot.current(self._listing_documents, self.changes.committed_through)
+        cached = listing_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Until the rebuild after this worker's own write lands, read MongoDB
+        if snapshot is not None and catalog_snapshot.includes_own_writes(snapshot):
+            # Served from the shared memory-mapped snapshot, without MongoDB
+            result = snapshot.query(page, limit, search, author_filter, sort_by, genres, author_exact)
+            for book in result["books"]:
+                with_cover_url(book)
+            if cover_urls_absolute():
+                listing_cache.set(cache_key, result)
+            return result
+        catalog_snapshot.schedule_rebuild(self._listing_documents, self.changes.committed_through)
+        
         skip = (page - 1) * limit
         
         # Build query
-        query = {}
+        query = dict(NOT_DELETED)
         if search:
             query["$or"] = [
                 {"title": {"$regex": search, "$options": "i"}},
@@ -37,6 +176,13 @@ class Book:
         if author_filter:
             query["author"] = {"$regex": author_filter, "$options": "i"}
         
+        # Facet filters (exact values)
+        if author_exact:
+            query.setdefault("$and", []).append({"author": author_exact})
+        
+        if genres:
+            query["genre"] = {"$in": genres}
+        
         # Build sort
         sort_options = {
             "updated_at": [("updated_at", -1)],
@@ -48,44 +194,279 @@ class Book:
         
         sort_criteria = sort_options.get(sort_by, [("updated_at", -1)])
         
-        books = list(self.collection.find(query).sort(sort_criteria).skip(skip).limit(limit))
+        books = list(self.collection.find(query, LISTING_PROJECTION).sort(sort_criteria).skip(skip).limit(limit))
         total = self.collection.count_documents(query)
         
         # Convert ObjectId to string
         for book in books:
             book['_id'] = str(book['_id'])
+            with_cover_url(book)
         
-        return {
+        result = {
             "books": books,
             "total": total,
             "page": page,
             "pages": (total + limit - 1) // limit
         }
+        if cover_urls_absolute():
+            listing_cache.set(cache_key, result)
+        return result
     
-    def get_book_by_id(self, book_id):
+    def get_book_by_id(self, book_id, include_content=True):
         try:
-            book = self.collection.find_one({"_id": ObjectId(book_id)})
+            # Similar books are served by get_similar_books
+            projection = {"similar_books": 0} if include_content else {"content": 0, "similar_books": 0}
+            book = self.collection.find_one({"_id": ObjectId(book_id), **NOT_DELETED}, projection)
             if book:
+                content_version = book.pop('content_version', None)
+                if include_content and "content" not in book:
+                    book['content'] = self.content.get_content(book['_id'], content_version)
                 book['_id'] = str(book['_id'])
-                return book
+                return with_cover_url(book)
         except:
             pass
         return None
     
+    def get_pages(self, book_id, start_page=1, count=10):
+        try:
+            book = self.collection.find_one(
+                {"_id": ObjectId(book_id), **NOT_DELETED},
+                {"total_pages": 1, "content": 1, "content_version": 1}
+            )
+        except:
+            return None
+        
+        if not book:
+            return None
+        
+        if "content" in book:
+            # Legacy book with the text still inline
+            pages = split_pages(book["content"])[start_page - 1:start_page - 1 + count]
+        else:
+            pages = self.content.get_pages(book_id, start_page, count, book.get("content_version"))
+        
+        return {
+            "pages": pages,
+            "start": start_page,
+            "total_pages": book.get("total_pages", 1)
+        }
+    
+    def get_version(self, book_id):
+        try:
+            book = self.collection.find_one({"_id": ObjectId(book_id), **NOT_DELETED}, {"updated_at": 1})
+        except:
+            return None
+        return book_version(book_id, book.get("updated_at")) if book else None
+    
+    def get_bundle(self, book_id):
+        """Metadata, cover reference and every page of a book, for offline reading"""
+        try:
+            book = self.collection.find_one({"_id": ObjectId(book_id), **NOT_DELETED}, {"similar_books": 0})
+        except:
+            return None
+        
+        if not book:
+            return None
+        
+        content_version = book.pop("content_version", None)
+        if "content" in book:
+            pages = split_pages(book.pop("content"))
+        else:
+            pages = self.content.get_pages(book_id, version=content_version)
+        book['_id'] = str(book['_id'])
+        with_cover_url(book)
+        
+        return {
+            "version": book_version(book_id, book.get("updated_at")),
+            "book": book,
+            "cover": {"cover_id": book.get("cover_id"), "url": book.get("cover_image", "")},
+            "pages": pages
+        }
+    
+    def get_text_stats(self, book_id):
+        try:
+            book = self.collection.find_one(
+                {"_id": ObjectId(book_id), **NOT_DELETED},
+                {"text_stats": 1, "content": 1, "content_version": 1}
+            )
+        except:
+            return None
+        
+        if not book:
+            return None
+        
+        if "text_stats" not in book:
+            # Book stored before text statistics existed; compute them once
+            content = book["content"] if "content" in book else self.content.get_content(book_id, book.get("content_version"))
+            book["text_stats"] = text_stats(content)
+            self.collection.update_one({"_id": book["_id"]}, {"$set": {"text_stats": book["text_stats"]}})
+        return book["text_stats"]
+    
+    def get_reading_estimate(self, book_id, current_page, total_pages, reading_speed="normal"):
+        """Words read and minutes left at `current_page` of `total_pages`.
+        
+        Readers paging by the stored pages get exact word offsets; readers
+        with their own pagination are estimated from their position.
+        """
+        stats = self.get_text_stats(book_id)
+        if not stats:
+            return None
+        
+        total_words = stats["total_words"]
+        page_words = stats["page_words"]
+        current_page = max(current_page, 1)
+        if total_pages == len(page_words) and current_page <= total_pages:
+            words_read = stats["word_offsets"][current_page - 1] + page_words[current_page - 1]
+        else:
+            words_read = round(total_words * min(current_page / max(total_pages, 1), 1))
+        
+        if reading_speed not in READING_SPEEDS:
+            reading_speed = "normal"
+        return {
+            "words_read": words_read,
+            "total_words": total_words,
+            "reading_speed": reading_speed,
+            "minutes_remaining": round((total_words - words_read) / READING_SPEEDS[reading_speed], 1)
+        }
+    
+    def search_content(self, book_id, query, limit=20):
+        """Search inside a book, or None if it doesn't exist"""
+        try:
+            book = self.collection.find_one(
+                {"_id": ObjectId(book_id), **NOT_DELETED},
+                {"content_version": 1, "content": 1}
+            )
+        except:
+            return None
+        
+        if not book:
+            return None
+        
+        # Books not yet moved to chunks by migrate_book_content.py
+        if "content" in book:
+            return self.content.search_pages(split_pages(book["content"]), query, limit)
+        
+        return self.content.search(book_id, query, limit, book.get("content_version"))
+    
     def update_book(self, book_id, update_data):
         try:
             update_data['updated_at'] = datetime.utcnow()
-            result = self.collection.update_one(
-                {"_id": ObjectId(book_id)},
-                {"$set": update_data}
-            )
-            return result.modified_count > 0
+            self._store_cover(update_data)
+            
+            update = {"$set": update_data}
+            content_version = None
+            if 'content' in update_data:
+                content = update_data.pop('content')
+                # Written as a new version; readers keep the old one until the book switches
+                content_version, update_data['total_pages'] = self.content.save(book_id, content)
+                update_data['content_version'] = content_version
+                update_data['content_size'] = len(content.encode('utf-8')) if content else 0
+                update_data['text_stats'] = text_stats(content)
+                # Drop any legacy inline copy of the text
+                update["$unset"] = {"content": ""}
+            
+            # The previous genre/author are needed to move the facet counts,
+            # and the previous content version to delete its chunks
+            update_data['change_seq'] = self.changes.reserve()
+            try:
+                previous = self.collection.find_one_and_update(
+                    {"_id": ObjectId(book_id), **NOT_DELETED},
+                    update,
+                    projection={**{field: 1 for field in FACET_FIELDS}, "content_version": 1},
+                    return_document=ReturnDocument.BEFORE
+                )
+            finally:
+                self.changes.release(update_data['change_seq'])
+            
+            if content_version is not None:
+                if previous is not None:
+                    self.content.delete_version(book_id, previous.get("content_version"))
+                else:
+                    # Missing or deleted book: drop the chunks just written
+                    self.content.delete(book_id, content_version)
+            
+            if previous is not None:
+                self.facets.replace_book(previous, update_data)
+                self._catalog_changed(update_data['change_seq'])
+                if 'title' in update_data or 'author' in update_data:
+                    catalog_index.update_book(book_id, update_data.get('title'), update_data.get('author'))
+            return previous is not None
         except:
             return False
     
     def delete_book(self, book_id):
         try:
-            result = self.collection.delete_one({"_id": ObjectId(book_id)})
-            return result.deleted_count > 0
+            # A tombstone replaces the book so delta sync can report the deletion
+            seq = self.changes.reserve()
+            try:
+                deleted = self.collection.find_one_and_replace(
+                    {"_id": ObjectId(book_id), **NOT_DELETED},
+                    self.changes.tombstone(ObjectId(book_id), seq),
+                    projection={field: 1 for field in FACET_FIELDS},
+                    return_document=ReturnDocument.BEFORE
+                )
+            finally:
+                self.changes.release(seq)
+            if deleted is not None:
+                self.content.delete(book_id)
+                self._remove_similar(book_id)
+                self.facets.add_books([deleted], delta=-1)
+                self._catalog_changed(seq)
+                catalog_index.remove_book(book_id)
+            return deleted is not None
         except:
             return False
+    
+    def get_similar_books(self, book_id):
+        """Similar books precomputed by build_similar_books.py"""
+        try:
+            book = self.collection.find_one({"_id": ObjectId(book_id), **NOT_DELETED}, {"similar_books": 1})
+        except:
+            return None
+        
+        if book is None:
+            return None
+        
+        similar = book.get("similar_books", [])
+        for item in similar:
+            item['book_id'] = str(item['book_id'])
+            with_cover_url(item)
+        return similar
+    
+    def _remove_similar(self, book_id):
+        """Drop a deleted book's vector and its entries in other books' lists"""
+        book_id = ObjectId(book_id)
+        self.vectors.delete_one({"_id": book_id})
+        self.collection.update_many(
+            {"similar_books.book_id": book_id},
+            {"$pull": {"similar_books": {"book_id": book_id}}}
+        )
+    
+    def get_changes(self, since=0, limit=500):
+        """Books written and deleted after change token `since`"""
+        result = self.changes.get_changes(since, limit, LISTING_PROJECTION)
+        for book in result["changes"]:
+            with_cover_url(book)
+        return result
+    
+    def _listing_documents(self):
+        return self.collection.find(NOT_DELETED, LISTING_PROJECTION)
+    
+    def _catalog_changed(self, change_seq):
+        catalog_snapshot.note_write(change_seq)
+        listing_cache.clear()
+        catalog_snapshot.schedule_rebuild(self._listing_documents, self.changes.committed_through)
+    
+    def _store_cover(self, book_data):
+        # Embedded (base64) covers go to the cover store and the book keeps only
+        # the id; the URL is built when the book is serialized
+        if "cover_image" not in book_data:
+            return
+        served = COVER_URL_PATTERN.search(book_data["cover_image"] or "")
+        cover_id = served.group(1) if served else self.covers.ingest(book_data["cover_image"])
+        if cover_id:
+            book_data["cover_id"] = cover_id
+            book_data["cover_image"] = ""
+        else:
+            # External URL (or no cover) replaces any stored one
+            book_data["cover_id"] = None
@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+
+# Matches books that have not been deleted; tombstones carry deleted: True
+NOT_DELETED = {"deleted": {"$ne": True}}
+
+# Tombstones older than this are purged by compaction
+TOMBSTONE_RETENTION_DAYS = 30
+
+# Reservations older than this are assumed to belong to a crashed writer
+# and stop holding back the change feed
+RESERVATION_TIMEOUT = timedelta(minutes=10)
+
+MAX_CHANGES_PER_PAGE = 500
+
+class BookChanges:
+    """Monotonic change sequence for the books collection.
+
+    Every book write stores the next `change_seq`; a client's sync token is
+    the highest sequence it has applied. Numbers are reserved right before
+    the book write and released after it; the feed never hands out a
+    change at or above the lowest open reservation, so a slow write can't
+    commit below a token a client already holds. Deleted books stay behind
+    as tombstones until compaction, after which clients with an older
+    token are told to reset.
+    """
+
+    def __init__(self, db):
+        self.books = db.books
+        self.counters = db.counters
+
+    def reserve(self, count=1):
+        """Reserve `count` sequence numbers and return the first.
+
+        The reservation is recorded in the same update that takes the
+        numbers; pass the result to `release` once the write is done.
+        """
+        counter = self.counters.find_one_and_update(
+            {"_id": "book_changes"},
+            [
+                {"$set": {"seq": {"$add": [{"$ifNull": ["$seq", 0]}, count]}}},
+                {"$set": {"pending": {"$concatArrays": [
+                    {"$ifNull": ["$pending", []]},
+                    [{"seq": {"$subtract": ["$seq", count - 1]}, "at": "$$NOW"}]
+                ]}}}
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return counter["seq"] - count + 1
+
+    def release(self, first_seq):
+        self.counters.update_one({"_id": "book_changes"}, {"$pull": {"pending": {"seq": first_seq}}})
+
+    def committed_through(self):
+        """Highest sequence number below which every write has finished"""
+        counter = self.counters.find_one({"_id": "book_changes"}) or {}
+        pending = self._open_reservations(counter)
+        return min(pending) - 1 if pending else counter.get("seq", 0)
+
+    @staticmethod
+    def _open_reservations(counter):
+        stale_before = datetime.utcnow() - RESERVATION_TIMEOUT
+        return [entry["seq"] for entry in counter.get("pending", []) if entry["at"] > stale_before]
+
+    @staticmethod
+    def tombstone(book_id, seq):
+        now = datetime.utcnow()
+        return {"_id": book_id, "deleted": True, "deleted_at": now, "updated_at": now, "change_seq": seq}
+
+    def get_changes(self, since=0, limit=MAX_CHANGES_PER_PAGE, projection=None):
+        counter = self.counters.find_one({"_id": "book_changes"}) or {}
+
+        # The client missed purged tombstones: replay everything from the start
+        reset = since < counter.get("compacted_through", 0)
+        if reset:
+            since = 0
+
+        # Changes from the lowest in-flight write on wait for the next poll
+        pending = self._open_reservations(counter)
+        seq_range = {"$gt": since}
+        if pending:
+            seq_range["$lt"] = min(pending)
+
+        cursor = self.books.find(
+            {"change_seq": seq_range},
+            projection
+        ).sort("change_seq", 1).limit(limit + 1)
+
+        changes = []
+        has_more = False
+        for book in cursor:
+            if len(changes) == limit:
+                has_more = True
+                break
+            book['_id'] = str(book['_id'])
+            changes.append(book)
+
+        return {
+            "changes": changes,
+            "next": str(changes[-1]["change_seq"] if changes else since),
+            "has_more": has_more,
+            "reset": reset
+        }
+
+    def compact(self, retention_days=TOMBSTONE_RETENTION_DAYS):
+        """Purge old tombstones and move the reset horizon past them"""
+        self.counters.update_one(
+            {"_id": "book_changes"},
+            {"$pull": {"pending": {"at": {"$lt": datetime.utcnow() - RESERVATION_TIMEOUT}}}}
+        )
+
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        query = {"deleted": True, "deleted_at": {"$lt": cutoff}}
+
+        newest = self.books.find_one(query, {"change_seq": 1}, sort=[("change_seq", -1)])
+        if newest is None:
+            return 0
+
+        # Raise the horizon first, so no client can sync past a purge unnoticed
+        self.counters.update_one(
+            {"_id": "book_changes"},
+            {"$max": {"compacted_through": newest["change_seq"]}},
+            upsert=True
+        )
+        return self.books.delete_many({**query, "change_seq": {"$lte": newest["change_seq"]}}).deleted_count
+
+    def backfill(self):
+        """Give books written before change tracking a sequence number"""
+        assigned = 0
+        for book in self.books.find({"change_seq": {"$exists": False}}, {"_id": 1}):
+            seq = self.reserve()
+            try:
+                self.books.update_one(
+                    {"_id": book["_id"], "change_seq": {"$exists": False}},
+                    {"$set": {"change_seq": seq}}
+                )
+            finally:
+                self.release(seq)
+            assigned += 1
+        return assigned
@@ -0,0 +1,240 @@
+import json
+import zlib
+from bson import Binary, ObjectId
+from utils.text import tokenize, highlight
+from utils.cache import LRUCache
+
+# Pages are the '\n\n'-separated blocks of a book's text
+PAGE_SEPARATOR = '\n\n'
+
+# Number of pages compressed together; one chunk is the unit read from MongoDB
+PAGES_PER_CHUNK = 32
+
+COMPRESSION_LEVEL = 9
+
+# Decoded postings of the books searched most recently, keyed by
+# (book_id, version); a version's postings never change
+postings_cache = LRUCache(maxsize=16)
+
+# Words per minute for each reading_preferences.reading_speed
+READING_SPEEDS = {"slow": 150, "normal": 250, "fast": 400}
+
+def split_pages(content):
+    return content.split(PAGE_SEPARATOR) if content else [""]
+
+def text_stats(content):
+    """Per-page word counts, cumulative word offsets and total reading minutes.
+
+    `word_offsets[i]` is the number of words before page i + 1, so words
+    read through any page is a lookup instead of re-counting the text.
+    """
+    page_words = [len(page.split()) for page in split_pages(content)]
+    word_offsets = []
+    total_words = 0
+    for count in page_words:
+        word_offsets.append(total_words)
+        total_words += count
+
+    return {
+        "page_words": page_words,
+        "word_offsets": word_offsets,
+        "total_words": total_words,
+        "reading_minutes": {
+            speed: round(total_words / words_per_minute, 1)
+            for speed, words_per_minute in READING_SPEEDS.items()
+        }
+    }
+
+class BookContent:
+    """Book text stored as zlib-compressed chunks of consecutive pages.
+
+    Keeping the text out of the book document keeps catalog reads small and
+    lifts the 16 MB document limit on book length. Readers fetch a window of
+    pages and only the chunks covering that window are decompressed.
+
+    The search index is one document per book in `book_postings`: for each
+    word, the pages containing it, delta-encoded and zlib-compressed.
+
+    Chunks and postings carry a `version`, and readers pass the book's
+    `content_version`. New text is written as a new version, the book is
+    switched to it in its own update, and only then is the old version
+    deleted, so readers never see a missing or half-written book. Chunks
+    from before versioning have no version and are read with version None.
+    """
+
+    def __init__(self, db):
+        self.collection = db.book_content
+        self.postings = db.book_postings
+
+    @staticmethod
+    def build_chunks(content):
+        """Split `content` into compressed chunk documents (without a book_id)."""
+        pages = split_pages(content)
+        chunks = []
+
+        for seq, offset in enumerate(range(0, len(pages), PAGES_PER_CHUNK)):
+            chunk_pages = pages[offset:offset + PAGES_PER_CHUNK]
+            text = PAGE_SEPARATOR.join(chunk_pages)
+            chunks.append({
+                "seq": seq,
+                "first_page": offset + 1,
+                "last_page": offset + len(chunk_pages),
+                "data": Binary(zlib.compress(text.encode('utf-8'), COMPRESSION_LEVEL))
+            })
+
+        return chunks
+
+    @staticmethod
+    def build_postings(content):
+        """Compressed map of each word to the pages containing it."""
+        term_pages = {}
+        for page_number, page in enumerate(split_pages(content), 1):
+            for term in set(tokenize(page)):
+                term_pages.setdefault(term, []).append(page_number)
+
+        # Page numbers are stored as gaps, which compress far better
+        encoded = {
+            term: [page - previous for previous, page in zip([0] + pages, pages)]
+            for term, pages in term_pages.items()
+        }
+        return Binary(zlib.compress(json.dumps(encoded, separators=(',', ':')).encode('utf-8'), COMPRESSION_LEVEL))
+
+    def save(self, book_id, content):
+        """Store `content` as a new version; returns (version, page count)."""
+        book_id = ObjectId(book_id)
+        version = ObjectId()
+        chunks = self.build_chunks(content)
+        try:
+            self.collection.insert_many([dict(chunk, book_id=book_id, version=version) for chunk in chunks])
+            self.postings.insert_one({"book_id": book_id, "version": version, "data": self.build_postings(content)})
+        except Exception:
+            self.delete(book_id, version)
+            raise
+        return version, chunks[-1]["last_page"]
+
+    def delete_version(self, book_id, version):
+        """Remove one version, once the book no longer points at it.
+
+        Only the version the book's own update replaced is removed, so
+        concurrent updates can't delete each other's chunks. None removes
+        chunks from before versioning.
+        """
+        query = {"book_id": ObjectId(book_id), "version": version}
+        self.collection.delete_many(query)
+        self.postings.delete_many(query)
+
+    def has_postings(self, book_id, version):
+        return self.postings.find_one({"book_id": ObjectId(book_id), "version": version}, {"_id": 1}) is not None
+
+    def get_pages(self, book_id, start_page=1, count=None, version=None):
+        """Return the pages in [start_page, start_page + count), 1-indexed."""
+        query = {"book_id": ObjectId(book_id), "version": version}
+        if count is not None:
+            end_page = start_page + count - 1
+            query["first_page"] = {"$lte": end_page}
+        query["last_page"] = {"$gte": start_page}
+
+        pages = []
+        first_page = None
+        for chunk in self.collection.find(query, {"first_page": 1, "data": 1}).sort("first_page", 1):
+            if first_page is None:
+                first_page = chunk["first_page"]
+            pages.extend(self._decompress(chunk))
+
+        if first_page is None:
+            return []
+
+        skip = start_page - first_page
+        end = skip + count if count is not None else None
+        return pages[skip:end]
+
+    def get_content(self, book_id, version=None):
+        return PAGE_SEPARATOR.join(self.get_pages(book_id, version=version))
+
+    def search(self, book_id, query, limit=20, version=None):
+        """Find pages containing every word of `query`.
+
+        Matching pages come from the book's postings; only the chunks
+        holding the returned pages are decompressed, to build snippets.
+        """
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return {"results": [], "has_more": False}
+
+        postings = self._load_postings(book_id, version)
+        if postings is None:
+            # Books indexed before postings were stored are scanned page by page
+            return self.search_pages(self.get_pages(book_id, version=version), query, limit)
+
+        matching = None
+        for term in terms:
+            pages = set(postings.get(term, ()))
+            matching = pages if matching is None else matching & pages
+        matching = sorted(matching)
+
+        wanted = matching[:limit]
+        seqs = sorted({(page - 1) // PAGES_PER_CHUNK for page in wanted})
+        texts = {}
+        cursor = self.collection.find(
+            {"book_id": ObjectId(book_id), "version": version, "seq": {"$in": seqs}},
+            {"first_page": 1, "data": 1}
+        )
+        for chunk in cursor:
+            for offset, text in enumerate(self._decompress(chunk)):
+                texts[chunk["first_page"] + offset] = text
+
+        results = [self._result(page, texts[page], terms) for page in wanted if page in texts]
+        return {"results": results, "has_more": len(matching) > limit}
+
+    @classmethod
+    def search_pages(cls, pages, query, limit=20):
+        """Search a list of page texts, for books whose text isn't indexed"""
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return {"results": [], "has_more": False}
+
+        results = []
+        for page_number, text in enumerate(pages, 1):
+            if not set(terms) <= set(tokenize(text)):
+                continue
+            if len(results) == limit:
+                return {"results": results, "has_more": True}
+            results.append(cls._result(page_number, text, terms))
+        return {"results": results, "has_more": False}
+
+    def delete(self, book_id, version=None):
+        """Delete all of a book's chunks, or only those of `version`"""
+        query = {"book_id": ObjectId(book_id)}
+        if version is not None:
+            query["version"] = version
+        try:
+            self.collection.delete_many(query)
+            self.postings.delete_many(query)
+        except:
+            pass
+
+    def _load_postings(self, book_id, version):
+        key = (str(book_id), version)
+        postings = postings_cache.get(key)
+        if postings is None:
+            document = self.postings.find_one({"book_id": ObjectId(book_id), "version": version})
+            if document is None:
+                return None
+            postings = {}
+            for term, gaps in json.loads(zlib.decompress(document["data"])).items():
+                pages, page = [], 0
+                for gap in gaps:
+                    page += gap
+                    pages.append(page)
+                postings[term] = pages
+            postings_cache.set(key, postings)
+        return postings
+
+    @staticmethod
+    def _result(page_number, text, terms):
+        snippet, matches = highlight(text, terms)
+        return {"page": page_number, "snippet": snippet, "matches": matches}
+
+    @staticmethod
+    def _decompress(chunk):
+        return zlib.decompress(chunk["data"]).decode('utf-8').split(PAGE_SEPARATOR)
@@ -0,0 +1,94 @@
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+# Book fields with materialized value counts
+FACET_FIELDS = ["genre", "author"]
+
+# Marks that the counts have been built from the whole catalog
+BUILT_MARKER = "_built"
+
+class BookFacets:
+    """Per-genre and per-author book counts, kept current by Book writes"""
+
+    def __init__(self, db):
+        self.collection = db.book_facets
+
+    def add_books(self, books, delta=1):
+        """Count (or, with delta=-1, uncount) the facet values of `books`"""
+        changes = {}
+        for book in books:
+            for field in FACET_FIELDS:
+                value = book.get(field)
+                if value:
+                    changes[(field, value)] = changes.get((field, value), 0) + delta
+        self._apply(changes)
+
+    def replace_book(self, old_book, new_values):
+        """Move a book's counts from its old facet values to `new_values`"""
+        changes = {}
+        for field in FACET_FIELDS:
+            if field not in new_values or new_values[field] == old_book.get(field):
+                continue
+            if old_book.get(field):
+                changes[(field, old_book[field])] = changes.get((field, old_book[field]), 0) - 1
+            if new_values[field]:
+                changes[(field, new_values[field])] = changes.get((field, new_values[field]), 0) + 1
+        self._apply(changes)
+
+    def get_facets(self, limit=50):
+        facets = {}
+        for field in FACET_FIELDS:
+            cursor = self.collection.find(
+                {"field": field, "count": {"$gt": 0}},
+                {"_id": 0, "value": 1, "count": 1}
+            ).sort([("count", -1), ("value", 1)]).limit(limit)
+            facets[field] = list(cursor)
+        return facets
+
+    def ensure_built(self, books_collection, query=None):
+        """Count the whole catalog once, the first time any worker starts.
+
+        Incremental updates only move counts, so the books that existed
+        before the counts did have to be counted once.
+        """
+        try:
+            self.collection.insert_one({"_id": BUILT_MARKER})
+        except DuplicateKeyError:
+            return False
+
+        try:
+            self.rebuild(books_collection, query)
+        except Exception:
+            self.collection.delete_one({"_id": BUILT_MARKER})
+            raise
+        return True
+
+    def rebuild(self, books_collection, query=None):
+        """Recount every facet from the books collection"""
+        counts = []
+        for field in FACET_FIELDS:
+            pipeline = [
+                {"$match": {**(query or {}), field: {"$nin": ["", None]}}},
+                {"$group": {"_id": f"${field}", "count": {"$sum": 1}}}
+            ]
+            for row in books_collection.aggregate(pipeline):
+                counts.append({"_id": f"{field}:{row['_id']}", "field": field, "value": row["_id"], "count": row["count"]})
+
+        self.collection.delete_many({"_id": {"$ne": BUILT_MARKER}})
+        self.collection.update_one({"_id": BUILT_MARKER}, {"$set": {"built_at": datetime.utcnow()}}, upsert=True)
+        if counts:
+            self.collection.insert_many(counts)
+
+    def _apply(self, changes):
+        operations = [
+            UpdateOne(
+                {"_id": f"{field}:{value}"},
+                {"$inc": {"count": delta}, "$setOnInsert": {"field": field, "value": value}},
+                upsert=True
+            )
+            for (field, value), delta in changes.items() if delta
+        ]
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+            self.collection.delete_many({"count": {"$lte": 0}})
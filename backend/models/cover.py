@@ -0,0 +1,138 @@
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+import gridfs
+from flask import has_request_context, request
+from gridfs.errors import FileExists, NoFile
+from PIL import Image
+
+# Longest edge (in pixels) of the pre-generated cover thumbnails
+THUMBNAIL_SIZES = {
+    "small": 160,
+    "medium": 320
+}
+
+# Public base URL of this API; defaults to the host of the current request
+PUBLIC_API_URL = os.getenv('PUBLIC_API_URL', '').rstrip('/')
+
+# URLs this API hands out for stored covers, e.g. when a client sends one back
+COVER_URL_PATTERN = re.compile(r'/api/covers/([0-9a-f]{64})(?:\?.*)?$')
+
+def cover_urls_absolute():
+    """Whether cover URLs built now include the API's host.
+
+    Without PUBLIC_API_URL, URLs built outside a request (e.g. during
+    warm-up) are relative and must not be cached for clients.
+    """
+    return bool(PUBLIC_API_URL) or has_request_context()
+
+def cover_url(cover_id):
+    base = PUBLIC_API_URL
+    if not base and has_request_context():
+        base = request.host_url.rstrip('/')
+    return f"{base}/api/covers/{cover_id}"
+
+def with_cover_url(book):
+    """Fill `cover_image` from `cover_id` when serializing a book.
+
+    Only the id is stored, so documents don't depend on the API's host.
+    """
+    if book.get("cover_id"):
+        book["cover_image"] = cover_url(book["cover_id"])
+    return book
+
+class CoverStore:
+    """Content-addressed cover images kept in GridFS.
+
+    Files are keyed by "<sha256>:<size>", so the same image uploaded for
+    several books is stored (and thumbnailed) exactly once.
+    """
+
+    def __init__(self, db):
+        self.fs = gridfs.GridFS(db, collection='covers')
+
+    def ingest(self, cover_image):
+        """Store an embedded cover and return its hash.
+
+        Returns None when `cover_image` is empty or an external URL, in
+        which case the caller keeps the value on the book as-is.
+        """
+        decoded = self._decode(cover_image)
+        if decoded is None:
+            return None
+
+        data, content_type = decoded
+        cover_id = hashlib.sha256(data).hexdigest()
+
+        if not self.fs.exists(self._file_id(cover_id, "original")):
+            self._put(cover_id, "original", data, content_type)
+            for size, edge in THUMBNAIL_SIZES.items():
+                thumbnail = self._make_thumbnail(data, edge)
+                if thumbnail:
+                    self._put(cover_id, size, thumbnail, "image/jpeg")
+
+        return cover_id
+
+    def get_cover(self, cover_id, size="original"):
+        """Return (bytes, content_type) for a cover, falling back to the original size."""
+        for candidate in (size, "original"):
+            try:
+                grid_out = self.fs.get(self._file_id(cover_id, candidate))
+                return grid_out.read(), grid_out.content_type or "application/octet-stream"
+            except NoFile:
+                continue
+        return None
+
+    def _put(self, cover_id, size, data, content_type):
+        try:
+            self.fs.put(
+                data,
+                _id=self._file_id(cover_id, size),
+                filename=cover_id,
+                content_type=content_type,
+                metadata={"size": size}
+            )
+        except FileExists:
+            # Another request stored the same image first
+            pass
+
+    @staticmethod
+    def _file_id(cover_id, size):
+        return f"{cover_id}:{size}"
+
+    @staticmethod
+    def _decode(cover_image):
+        if not cover_image or not isinstance(cover_image, str):
+            return None
+
+        if cover_image.startswith(('http://', 'https://', '/')):
+            return None
+
+        content_type = "image/jpeg"
+        payload = cover_image
+        if cover_image.startswith('data:'):
+            header, _, payload = cover_image.partition(',')
+            if ';base64' not in header:
+                return None
+            content_type = header[5:].split(';')[0] or content_type
+
+        try:
+            return base64.b64decode(payload, validate=True), content_type
+        except (binascii.Error, ValueError):
+            return None
+
+    @staticmethod
+    def _make_thumbnail(data, edge):
+        try:
+            image = Image.open(io.BytesIO(data))
+            image = image.convert("RGB")
+            image.thumbnail((edge, edge))
+            output = io.BytesIO()
+            image.save(output, format="JPEG", quality=80, optimize=True)
+            return output.getvalue()
+        except Exception as e:
+            print(f"Could not generate {edge}px cover thumbnail: {str(e)}")
+            return None
@@ -0,0 +1,164 @@
+from bson import ObjectId
+from datetime import datetime, timedelta
+import atexit
+import threading
+import time
+
+# Gaps between progress updates longer than this start a new reading session
+# and are not counted as reading time
+MAX_READING_GAP_SECONDS = 600
+
+# Buffered events are written once this many are pending, or every interval
+EVENT_BATCH_SIZE = 100
+EVENT_FLUSH_INTERVAL = 5
+
+# Rollups recompute from this long before the last run, to pick up events
+# that were still buffered in a worker when it ran
+LATE_EVENT_GRACE = timedelta(minutes=10)
+
+# How far back streaks are looked for
+STREAK_LOOKBACK_DAYS = 365
+
+class _EventBuffer:
+    """Per-process buffer of reading events, written with insert_many"""
+
+    def __init__(self):
+        self.events = []
+        self.collection = None
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def add(self, collection, event):
+        with self._lock:
+            self.collection = collection
+            self.events.append(event)
+            full = len(self.events) >= EVENT_BATCH_SIZE
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+                self._flusher.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            events, self.events = self.events, []
+        if events:
+            try:
+                self.collection.insert_many(events, ordered=False)
+            except Exception as e:
+                print(f"Error writing reading events: {str(e)}")
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(EVENT_FLUSH_INTERVAL)
+            self.flush()
+
+event_buffer = _EventBuffer()
+atexit.register(event_buffer.flush)
+
+class ReadingEvents:
+    """Append-only reading events (time-series) and per-user daily rollups"""
+
+    def __init__(self, db):
+        self.collection = db.reading_events
+        self.rollups = db.reading_rollups
+        self.rollup_state = db.reading_rollup_state
+
+    def record(self, user_id, book_id, current_page, previous=None):
+        """Buffer one progress event; `previous` is the reading_history entry before the update"""
+        now = datetime.utcnow()
+        pages_read = 0
+        seconds = 0
+        if previous:
+            pages_read = max(current_page - previous.get("current_page", 0), 0)
+            if previous.get("last_read"):
+                gap = (now - previous["last_read"]).total_seconds()
+                if 0 < gap <= MAX_READING_GAP_SECONDS:
+                    seconds = gap
+
+        event_buffer.add(self.collection, {
+            "ts": now,
+            "meta": {"user_id": ObjectId(user_id), "book_id": ObjectId(book_id)},
+            "page": current_page,
+            "pages_read": pages_read,
+            "seconds": seconds
+        })
+
+    def rollup(self):
+        """Recompute daily rollups for every day touched since the last run"""
+        started = datetime.utcnow()
+        state = self.rollup_state.find_one({"_id": "reading_events"}) or {}
+
+        match = {}
+        since = state.get("rolled_up_to")
+        if since:
+            match["ts"] = {"$gte": datetime(since.year, since.month, since.day)}
+
+        self.collection.aggregate([
+            {"$match": match},
+            {"$group": {
+                "_id": {
+                    "user_id": "$meta.user_id",
+                    "day": {"$dateTrunc": {"date": "$ts", "unit": "day"}}
+                },
+                "pages_read": {"$sum": "$pages_read"},
+                "seconds": {"$sum": "$seconds"},
+                "books": {"$addToSet": "$meta.book_id"}
+            }},
+            {"$project": {
+                "_id": 0,
+                "user_id": "$_id.user_id",
+                "day": "$_id.day",
+                "pages_read": 1,
+                "minutes_read": {"$round": [{"$divide": ["$seconds", 60]}, 1]},
+                "books_read": {"$size": "$books"},
+                "updated_at": "$$NOW"
+            }},
+            {"$merge": {
+                "into": "reading_rollups",
+                "on": ["user_id", "day"],
+                "whenMatched": "replace",
+                "whenNotMatched": "insert"
+            }}
+        ])
+
+        self.rollup_state.update_one(
+            {"_id": "reading_events"},
+            {"$set": {"rolled_up_to": started - LATE_EVENT_GRACE}},
+            upsert=True
+        )
+
+    def get_daily_activity(self, user_id, days=30):
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        lookback = max(days, STREAK_LOOKBACK_DAYS)
+
+        rollups = list(self.rollups.find(
+            {"user_id": ObjectId(user_id), "day": {"$gte": today - timedelta(days=lookback - 1)}},
+            {"_id": 0, "user_id": 0}
+        ).sort("day", 1))
+
+        current_streak, longest_streak = self._streaks(
+            [r["day"] for r in rollups if r["pages_read"] > 0 or r["minutes_read"] > 0],
+            today
+        )
+
+        first_day = today - timedelta(days=days - 1)
+        return {
+            "days": [r for r in rollups if r["day"] >= first_day],
+            "current_streak": current_streak,
+            "longest_streak": longest_streak
+        }
+
+    @staticmethod
+    def _streaks(active_days, today):
+        longest = 0
+        run = 0
+        previous = None
+        for day in active_days:
+            run = run + 1 if previous and day - previous == timedelta(days=1) else 1
+            longest = max(longest, run)
+            previous = day
+
+        # A streak is still current if the user read today or yesterday
+        current = run if previous and today - previous <= timedelta(days=1) else 0
+        return current, longest
@@ -1,12 +1,38 @@
 from pymongo import MongoClient
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timedelta
+from pymongo import ReplaceOne
+from models.reading_events import ReadingEvents
+from models.cover import with_cover_url
+from models.book_changes import NOT_DELETED
+
+# Size of each user's recently-read list
+RECENT_READS_LIMIT = 20
+
+# Entries moved to the archive by archive_entries(): completed books not
+# opened for COMPLETED_ARCHIVE_DAYS, and any book not opened for INACTIVE_ARCHIVE_DAYS
+COMPLETED_ARCHIVE_DAYS = 30
+INACTIVE_ARCHIVE_DAYS = 180
+ARCHIVE_BATCH_SIZE = 1000
+
+# Book fields returned with each reading history entry
+HISTORY_BOOK_PROJECTION = {"title": 1, "author": 1, "genre": 1, "cover_image": 1, "cover_id": 1}
 
 class ReadingHistory:
     def __init__(self, db):
         self.collection = db.reading_history
+        self.archive = db.reading_history_archive
+        self.recent_reads = db.recent_reads
+        self.books = db.books
+        self.events = ReadingEvents(db)
     
     def update_reading_progress(self, user_id, book_id, current_page, total_pages):
+        history_id, previous = self._save_progress(user_id, book_id, current_page, total_pages)
+        self._update_recent_reads(user_id, book_id, current_page, total_pages)
+        self.events.record(user_id, book_id, current_page, previous)
+        return history_id
+    
+    def _save_progress(self, user_id, book_id, current_page, total_pages):
         # Check if reading history exists for this user and book
         existing = self.collection.find_one({
             "user_id": ObjectId(user_id),
@@ -27,8 +53,14 @@ class ReadingHistory:
                     }
                 }
             )
-            return str(existing["_id"])
+            return str(existing["_id"]), existing
         else:
+            # A book read again after being archived keeps its original start date
+            archived = self.archive.find_one_and_delete({
+                "user_id": ObjectId(user_id),
+                "book_id": ObjectId(book_id)
+            })
+            
             # Create new record
             history_data = {
                 "user_id": ObjectId(user_id),
@@ -36,24 +68,210 @@ class ReadingHistory:
                 "current_page": current_page,
                 "total_pages": total_pages,
                 "progress_percentage": (current_page / total_pages) * 100 if total_pages > 0 else 0,
-                "started_reading": datetime.utcnow(),
+                "started_reading": (archived or {}).get("started_reading") or datetime.utcnow(),
                 "last_read": datetime.utcnow(),
                 "created_at": datetime.utcnow(),
                 "updated_at": datetime.utcnow()
             }
             
             result = self.collection.insert_one(history_data)
-            return str(result.inserted_id)
+            return str(result.inserted_id), archived
+    
+    def _update_recent_reads(self, user_id, book_id, current_page, total_pages):
+        """Move the book to the front of the user's bounded recently-read list"""
+        book_id = ObjectId(book_id)
+        summary = self._book_summary(book_id)
+        if summary is None:
+            # Deleted books are not listed, even if a client syncs late progress
+            return
+        entry = {
+            **summary,
+            "book_id": book_id,
+            "current_page": current_page,
+            "total_pages": total_pages,
+            "progress_percentage": (current_page / total_pages) * 100 if total_pages > 0 else 0,
+            "last_read": datetime.utcnow()
+        }
+        
+        self.recent_reads.update_one(
+            {"_id": ObjectId(user_id)},
+            [{"$set": {
+                "items": {"$slice": [
+                    {"$concatArrays": [
+                        [{"$literal": entry}],
+                        {"$filter": {
+                            "input": {"$ifNull": ["$items", []]},
+                            "cond": {"$ne": ["$$this.book_id", book_id]}
+                        }}
+                    ]},
+                    RECENT_READS_LIMIT
+                ]}
+            }}],
+            upsert=True
+        )
+    
+    def _book_summary(self, book_id):
+        # Read on every save, not cached: a book deleted by another worker
+        # must not be re-added to recently-read lists
+        book = self.books.find_one(
+            {"_id": book_id, **NOT_DELETED},
+            {"title": 1, "author": 1, "cover_image": 1, "cover_id": 1}
+        )
+        if book is None:
+            return None
+        return {
+            "title": book.get("title", ""),
+            "author": book.get("author", ""),
+            "cover_image": book.get("cover_image", ""),
+            "cover_id": book.get("cover_id")
+        }
+    
+    def remove_book(self, book_id):
+        """Drop a deleted book from every recently-read list"""
+        book_id = ObjectId(book_id)
+        self.recent_reads.update_many({"items.book_id": book_id}, {"$pull": {"items": {"book_id": book_id}}})
+    
+    def backfill_recent_reads(self):
+        """Build recently-read lists for users who read before they existed.
+        
+        Users who already have a list are left alone, so this can be re-run.
+        """
+        filled = 0
+        for user_id in self.collection.distinct("user_id"):
+            if self.recent_reads.find_one({"_id": user_id}, {"_id": 1}):
+                continue
+            
+            entries = list(self.collection.find({"user_id": user_id}).sort("last_read", -1).limit(RECENT_READS_LIMIT))
+            books = {
+                book["_id"]: book
+                for book in self.books.find(
+                    {"_id": {"$in": [entry["book_id"] for entry in entries]}, **NOT_DELETED},
+                    {"title": 1, "author": 1, "cover_image": 1, "cover_id": 1}
+                )
+            }
+            
+            items = []
+            for entry in entries:
+                book = books.get(entry["book_id"])
+                if book is None:
+                    continue
+                items.append({
+                    "title": book.get("title", ""),
+                    "author": book.get("author", ""),
+                    "cover_image": book.get("cover_image", ""),
+                    "cover_id": book.get("cover_id"),
+                    "book_id": entry["book_id"],
+                    "current_page": entry.get("current_page", 0),
+                    "total_pages": entry.get("total_pages", 0),
+                    "progress_percentage": entry.get("progress_percentage", 0),
+                    "last_read": entry.get("last_read")
+                })
+            
+            # Progress saved while this ran already created the list; keep it
+            result = self.recent_reads.update_one(
+                {"_id": user_id},
+                {"$setOnInsert": {"items": items}},
+                upsert=True
+            )
+            if result.upserted_id is not None:
+                filled += 1
+        return filled
     
-    def get_user_reading_history(self, user_id, page=1, limit=10):
+    def get_continue_reading(self, user_id, limit=5, include_completed=False):
+        """Most recently read books, newest first, from the recently-read list"""
+        recent = self.recent_reads.find_one({"_id": ObjectId(user_id)}) or {}
+        
+        books = []
+        for item in recent.get("items", []):
+            if not include_completed and item["progress_percentage"] >= 99.9:
+                continue
+            item['book_id'] = str(item['book_id'])
+            books.append(with_cover_url(item))
+            if len(books) == limit:
+                break
+        
+        return books
+    
+    def archive_entries(self, completed_days=COMPLETED_ARCHIVE_DAYS, inactive_days=INACTIVE_ARCHIVE_DAYS):
+        """Move completed or long-inactive entries to the archive collection.
+        
+        Archived entries are compact summaries; they are only read when a
+        caller passes include_archived, and moved back when the book is
+        read again.
+        """
+        now = datetime.utcnow()
+        query = {"$or": [
+            {"last_read": {"$lt": now - timedelta(days=completed_days)}, "progress_percentage": {"$gte": 99.9}},
+            {"last_read": {"$lt": now - timedelta(days=inactive_days)}}
+        ]}
+        
+        archived = 0
+        while True:
+            entries = list(self.collection.find(query).limit(ARCHIVE_BATCH_SIZE))
+            if not entries:
+                return archived
+            
+            titles = {
+                book["_id"]: book.get("title", "")
+                for book in self.books.find(
+                    {"_id": {"$in": list({entry["book_id"] for entry in entries})}},
+                    {"title": 1}
+                )
+            }
+            
+            self.archive.bulk_write([
+                ReplaceOne(
+                    {"user_id": entry["user_id"], "book_id": entry["book_id"]},
+                    {
+                        "user_id": entry["user_id"],
+                        "book_id": entry["book_id"],
+                        "title": titles.get(entry["book_id"], ""),
+                        "current_page": entry.get("current_page", 0),
+                        "total_pages": entry.get("total_pages", 0),
+                        "progress_percentage": entry.get("progress_percentage", 0),
+                        "started_reading": entry.get("started_reading"),
+                        "last_read": entry.get("last_read"),
+                        "archived_at": now
+                    },
+                    upsert=True
+                )
+                for entry in entries
+            ], ordered=False)
+            
+            for entry in entries:
+                # Matching last_read keeps a progress write made since the find
+                removed = self.collection.delete_one({"_id": entry["_id"], "last_read": entry.get("last_read")})
+                if removed.deleted_count:
+                    archived += 1
+                else:
+                    self.archive.delete_one({
+                        "user_id": entry["user_id"],
+                        "book_id": entry["book_id"],
+                        "archived_at": now
+                    })
+    
+    def _with_archive(self, user_id, pipeline):
+        # Append the user's archived entries, flagged, to the hot ones
+        return [pipeline[0], {"$unionWith": {
+            "coll": self.archive.name,
+            "pipeline": [
+                {"$match": {"user_id": ObjectId(user_id)}},
+                {"$addFields": {"archived": True}}
+            ]
+        }}] + pipeline[1:]
+    
+    def get_user_reading_history(self, user_id, page=1, limit=10, include_archived=False):
         skip = (page - 1) * limit
         
         pipeline = [
             {"$match": {"user_id": ObjectId(user_id)}},
             {"$lookup": {
                 "from": "books",
-                "localField": "book_id",
-                "foreignField": "_id",
+                "let": {"book_id": "$book_id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$_id", "$$book_id"]}, **NOT_DELETED}},
+                    {"$project": HISTORY_BOOK_PROJECTION}
+                ],
                 "as": "book"
             }},
             {"$unwind": "$book"},
@@ -62,8 +280,12 @@ class ReadingHistory:
             {"$limit": limit}
         ]
         
-        history = list(self.collection.aggregate(pipeline))
         total = self.collection.count_documents({"user_id": ObjectId(user_id)})
+        if include_archived:
+            pipeline = self._with_archive(user_id, pipeline)
+            total += self.archive.count_documents({"user_id": ObjectId(user_id)})
+        
+        history = list(self.collection.aggregate(pipeline))
         
         # Convert ObjectIds to strings
         for item in history:
@@ -71,6 +293,7 @@ class ReadingHistory:
             item['user_id'] = str(item['user_id'])
             item['book_id'] = str(item['book_id'])
             item['book']['_id'] = str(item['book']['_id'])
+            with_cover_url(item['book'])
         
         return {
             "history": history,
@@ -79,12 +302,17 @@ class ReadingHistory:
             "pages": (total + limit - 1) // limit
         }
     
-    def get_book_progress(self, user_id, book_id):
+    def get_book_progress(self, user_id, book_id, include_archived=False):
         try:
-            progress = self.collection.find_one({
+            query = {
                 "user_id": ObjectId(user_id),
                 "book_id": ObjectId(book_id)
-            })
+            }
+            progress = self.collection.find_one(query)
+            if progress is None and include_archived:
+                progress = self.archive.find_one(query)
+                if progress:
+                    progress['archived'] = True
             
             if progress:
                 progress['_id'] = str(progress['_id'])
@@ -95,7 +323,7 @@ class ReadingHistory:
             pass
         return None
     
-    def get_reading_stats(self, user_id):
+    def get_reading_stats(self, user_id, include_archived=False):
         try:
             # Get basic reading stats
             pipeline = [
@@ -107,6 +335,7 @@ class ReadingHistory:
                     "as": "book"
                 }},
                 {"$unwind": "$book"},
+                {"$match": {"book.deleted": {"$ne": True}}},
                 {"$group": {
                     "_id": None,
                     "total_books_started": {"$sum": 1},
@@ -157,6 +386,9 @@ class ReadingHistory:
                 }}
             ]
             
+            if include_archived:
+                pipeline = self._with_archive(user_id, pipeline)
+            
             result = list(self.collection.aggregate(pipeline))
             
             if result:
@@ -0,0 +1,179 @@
+from bson import Binary
+from datetime import datetime
+from pymongo import UpdateOne, ReplaceOne
+import numpy as np
+from models.book_content import BookContent, split_pages
+from models.book_changes import NOT_DELETED
+from utils.recommendations import (
+    build_matrix, document_frequencies, inverse_document_frequencies,
+    top_k_similar, vectorize
+)
+
+TOP_K = 10
+
+# Bytes allowed for one block of similarity scores
+MEMORY_BUDGET = 256 * 1024 * 1024
+
+# Leading pages of each book included in its vector
+CONTENT_SAMPLE_PAGES = 8
+
+WRITE_BATCH_SIZE = 1000
+
+class SimilarBooks:
+    """Batch job storing each book's most similar books on the book document.
+
+    A full rebuild recomputes term weights over the whole catalog. The
+    incremental update vectorizes only books added or changed since, using
+    the stored weights and vectors, and pushes new books into their
+    neighbors' lists.
+
+    Only build_similar_books.py imports this module, so numpy and scipy are
+    never loaded by the web workers; the stored lists are read and cleaned
+    up by the Book model.
+    """
+
+    def __init__(self, db):
+        self.books = db.books
+        self.vectors = db.book_vectors
+        self.state = db.recommendation_state
+        self.content = BookContent(db)
+
+    def rebuild(self, top_k=TOP_K, memory_budget=MEMORY_BUDGET):
+        df, count = document_frequencies(doc for _, doc in self._documents({}))
+        idf = inverse_document_frequencies(df, count)
+        self.state.replace_one(
+            {"_id": "idf"},
+            {"_id": "idf", "books": count, "weights": Binary(idf.tobytes()), "updated_at": datetime.utcnow()},
+            upsert=True
+        )
+
+        book_ids, vectors = [], []
+        for book_id, document in self._documents({}):
+            book_ids.append(book_id)
+            vectors.append(vectorize(document, idf))
+        self._save_vectors(book_ids, vectors)
+
+        matrix = build_matrix(vectors)
+        self._save_neighbors(book_ids, book_ids, top_k_similar(matrix, matrix, top_k, memory_budget, 0))
+        return len(book_ids)
+
+    def update_new(self, top_k=TOP_K, memory_budget=MEMORY_BUDGET):
+        state = self.state.find_one({"_id": "idf"})
+        if not state:
+            return self.rebuild(top_k, memory_budget)
+        idf = np.frombuffer(state["weights"], dtype=np.float32)
+
+        pending = {"$or": [
+            {"similar_computed_at": {"$exists": False}},
+            {"$expr": {"$gt": ["$updated_at", "$similar_computed_at"]}}
+        ]}
+        new_ids, new_vectors = [], []
+        for book_id, document in self._documents(pending):
+            new_ids.append(book_id)
+            new_vectors.append(vectorize(document, idf))
+        if not new_ids:
+            return 0
+        self._save_vectors(new_ids, new_vectors)
+
+        # Existing books first, new ones last, so new row i is corpus row n_existing + i
+        new_set = set(new_ids)
+        corpus_ids, corpus_vectors = [], []
+        for stored in self.vectors.find({"_id": {"$nin": new_ids}}):
+            corpus_ids.append(stored["_id"])
+            corpus_vectors.append((
+                np.frombuffer(stored["indices"], dtype=np.int32),
+                np.frombuffer(stored["weights"], dtype=np.float32)
+            ))
+        offset = len(corpus_ids)
+        corpus_ids.extend(new_ids)
+        corpus_vectors.extend(new_vectors)
+
+        neighbors = list(top_k_similar(
+            build_matrix(new_vectors), build_matrix(corpus_vectors),
+            top_k, memory_budget, offset
+        ))
+        self._save_neighbors(new_ids, corpus_ids, neighbors)
+
+        # Offer each new book to the lists of its own neighbors
+        summaries = self._summaries(new_ids)
+        operations = []
+        for row, row_neighbors in neighbors:
+            book_id = new_ids[row]
+            for column, score in row_neighbors:
+                neighbor_id = corpus_ids[column]
+                if neighbor_id in new_set:
+                    continue
+                operations.append(UpdateOne(
+                    {"_id": neighbor_id},
+                    {"$pull": {"similar_books": {"book_id": book_id}}}
+                ))
+                operations.append(UpdateOne(
+                    {"_id": neighbor_id},
+                    {"$push": {"similar_books": {
+                        "$each": [{**summaries.get(book_id, {}), "book_id": book_id, "score": round(score, 4)}],
+                        "$sort": {"score": -1},
+                        "$slice": top_k
+                    }}}
+                ))
+        self._bulk_write(self.books, operations)
+        return len(new_ids)
+
+    def _documents(self, query):
+        projection = {"title": 1, "description": 1, "genre": 1, "content": 1, "content_version": 1}
+        for book in self.books.find({**query, **NOT_DELETED}, projection).batch_size(200):
+            if "content" in book:
+                pages = split_pages(book["content"])[:CONTENT_SAMPLE_PAGES]
+            else:
+                pages = self.content.get_pages(book["_id"], 1, CONTENT_SAMPLE_PAGES, book.get("content_version"))
+            yield book["_id"], {
+                "title": book.get("title", ""),
+                "description": book.get("description", ""),
+                "genre": book.get("genre", ""),
+                "content": " ".join(pages)
+            }
+
+    def _save_vectors(self, book_ids, vectors):
+        self._bulk_write(self.vectors, [
+            ReplaceOne(
+                {"_id": book_id},
+                {"_id": book_id, "indices": Binary(indices.tobytes()), "weights": Binary(weights.tobytes())},
+                upsert=True
+            )
+            for book_id, (indices, weights) in zip(book_ids, vectors)
+        ])
+
+    def _save_neighbors(self, row_ids, column_ids, neighbors):
+        neighbors = list(neighbors)
+        needed = {column_ids[column] for _, row in neighbors for column, _ in row}
+        summaries = self._summaries(list(needed))
+
+        now = datetime.utcnow()
+        operations = []
+        for row, row_neighbors in neighbors:
+            similar = [
+                {**summaries.get(column_ids[column], {}), "book_id": column_ids[column], "score": round(score, 4)}
+                for column, score in row_neighbors
+            ]
+            operations.append(UpdateOne(
+                {"_id": row_ids[row]},
+                {"$set": {"similar_books": similar, "similar_computed_at": now}}
+            ))
+        self._bulk_write(self.books, operations)
+
+    def _summaries(self, book_ids):
+        summaries = {}
+        for start in range(0, len(book_ids), WRITE_BATCH_SIZE):
+            batch = book_ids[start:start + WRITE_BATCH_SIZE]
+            for book in self.books.find({"_id": {"$in": batch}}, {"title": 1, "author": 1, "cover_image": 1, "cover_id": 1}):
+                summaries[book["_id"]] = {
+                    "title": book.get("title", ""),
+                    "author": book.get("author", ""),
+                    "cover_image": book.get("cover_image", ""),
+                    "cover_id": book.get("cover_id")
+                }
+        return summaries
+
+    @staticmethod
+    def _bulk_write(collection, operations):
+        for start in range(0, len(operations), WRITE_BATCH_SIZE):
+            collection.bulk_write(operations[start:start + WRITE_BATCH_SIZE], ordered=True)
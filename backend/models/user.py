@@ -1,8 +1,21 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument
 from bson import ObjectId
 import bcrypt
 from datetime import datetime
 import os
+import time
+from utils.cache import LRUCache
+
+# Profile fields embedded in access tokens, so the UI rarely needs /profile
+TOKEN_PROFILE_FIELDS = ["username", "email", "full_name", "profile_picture", "reading_preferences"]
+
+# Longer values (e.g. data: URI pictures) are left out of the token
+MAX_TOKEN_FIELD_LENGTH = 512
+
+# (user, checked_at) by user id. Writes invalidate only this worker's entry,
+# so hits older than USER_REVALIDATE_SECONDS compare updated_at with MongoDB
+user_cache = LRUCache(maxsize=1024, ttl=300)
+USER_REVALIDATE_SECONDS = 5
 
 class User:
     def __init__(self, db):
@@ -39,30 +52,64 @@ class User:
         if user and bcrypt.checkpw(password.encode('utf-8'), user['password']):
             user['_id'] = str(user['_id'])
             del user['password']  # Don't return password
+            user_cache.set(user['_id'], (user, time.monotonic()))
             return user
         return None
     
     def get_user_by_id(self, user_id):
+        cached = user_cache.get(user_id)
+        if cached is not None:
+            user, checked_at = cached
+            if time.monotonic() - checked_at < USER_REVALIDATE_SECONDS:
+                return user
+            try:
+                current = self.collection.find_one({"_id": ObjectId(user_id)}, {"updated_at": 1})
+            except:
+                current = None
+            if current is not None and current.get("updated_at") == user.get("updated_at"):
+                user_cache.set(user_id, (user, time.monotonic()))
+                return user
+            user_cache.invalidate(user_id)
+        
         try:
-            user = self.collection.find_one({"_id": ObjectId(user_id)})
+            user = self.collection.find_one({"_id": ObjectId(user_id)}, {"password": 0})
             if user:
                 user['_id'] = str(user['_id'])
-                del user['password']  # Don't return password
+                user_cache.set(user_id, (user, time.monotonic()))
                 return user
         except:
             pass
         return None
     
     def update_user_profile(self, user_id, update_data):
+        """Apply the update and return the updated user, or None on failure"""
         try:
             update_data['updated_at'] = datetime.utcnow()
-            result = self.collection.update_one(
+            user = self.collection.find_one_and_update(
                 {"_id": ObjectId(user_id)},
-                {"$set": update_data}
+                {"$set": update_data},
+                projection={"password": 0},
+                return_document=ReturnDocument.AFTER
             )
-            return result.modified_count > 0
         except:
-            return False
+            user = None
+        
+        user_cache.invalidate(user_id)
+        if user:
+            user['_id'] = str(user['_id'])
+            user_cache.set(user_id, (user, time.monotonic()))
+        return user
+    
+    @staticmethod
+    def token_claims(user):
+        """Additional JWT claims carrying the profile fields the UI displays"""
+        profile = {}
+        for field in TOKEN_PROFILE_FIELDS:
+            value = user.get(field)
+            if isinstance(value, str) and len(value) > MAX_TOKEN_FIELD_LENGTH:
+                continue
+            profile[field] = value
+        return {"profile": profile}
     
     def get_user_by_email(self, email):
         user = self.collection.find_one({"email": email})
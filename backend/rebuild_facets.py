@@ -0,0 +1,14 @@
+from utils.database import db
+from models.book import Book
+from models.book_changes import NOT_DELETED
+
+def rebuild_facets():
+    """Recount the genre/author facet counts from the books collection"""
+    
+    print("Rebuilding book facets...")
+    book_model = Book(db)
+    book_model.facets.rebuild(book_model.collection, NOT_DELETED)
+    print("Book facets rebuilt!")
+
+if __name__ == "__main__":
+    rebuild_facets()
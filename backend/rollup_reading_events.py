@@ -0,0 +1,12 @@
+from utils.database import db
+from models.reading_events import ReadingEvents
+
+def rollup_reading_events():
+    """Refresh per-user daily reading rollups from the reading events stream"""
+    
+    print("Rolling up reading events...")
+    ReadingEvents(db).rollup()
+    print("Reading rollups updated!")
+
+if __name__ == "__main__":
+    rollup_reading_events()
@@ -29,12 +29,17 @@ def register():
             return jsonify({'error': 'User with this email or username already exists'}), 400
         
         # Create access token
-        access_token = create_access_token(identity=user_id)
+        user = user_model.get_user_by_id(user_id)
+        access_token = create_access_token(
+            identity=user_id,
+            additional_claims=user_model.token_claims(user)
+        )
         
         return jsonify({
             'message': 'User created successfully',
             'access_token': access_token,
-            'user_id': user_id
+            'user_id': user_id,
+            'user': user
         }), 201
         
     except Exception as e:
@@ -59,7 +64,10 @@ def login():
             return jsonify({'error': 'Invalid email or password'}), 401
         
         # Create access token
-        access_token = create_access_token(identity=user['_id'])
+        access_token = create_access_token(
+            identity=user['_id'],
+            additional_claims=user_model.token_claims(user)
+        )
         
         return jsonify({
             'message': 'Login successful',
@@ -97,15 +105,20 @@ def update_profile():
         for field in sensitive_fields:
             data.pop(field, None)
         
-        success = user_model.update_user_profile(user_id, data)
+        user = user_model.update_user_profile(user_id, data)
         
-        if not success:
+        if not user:
             return jsonify({'error': 'Failed to update profile'}), 400
         
-        # Return updated user
-        user = user_model.get_user_by_id(user_id)
+        # Re-issue the token so its profile claims match the update
+        access_token = create_access_token(
+            identity=user_id,
+            additional_claims=user_model.token_claims(user)
+        )
+        
         return jsonify({
             'message': 'Profile updated successfully',
+            'access_token': access_token,
             'user': user
         }), 200
         
@@ -1,13 +1,118 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.book import Book
+from flask import Blueprint, request, jsonify, current_app, Response
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from models.book import Book, book_version
+from models.cover import cover_urls_absolute
 from models.reading_history import ReadingHistory
+from models.book_changes import NOT_DELETED, MAX_CHANGES_PER_PAGE
 from utils.database import db
+from utils.ingest import prepare_record
+from utils.catalog_index import catalog_index
+from utils.singleflight import SingleFlight
+from utils.catalog_snapshot import catalog_snapshot
+from utils.cache import LRUCache
+import gzip
 
 books_bp = Blueprint('books', __name__)
 book_model = Book(db)
 reading_history_model = ReadingHistory(db)
 
+# Autocomplete is served from memory; build it once at startup, then
+# rebuild it in the background whenever a new catalog snapshot is mapped
+catalog_index.build(book_model.collection, NOT_DELETED)
+catalog_snapshot.on_reload(catalog_index.sync)
+
+# Concurrent identical loads share one database fetch and serialized body
+book_loads = SingleFlight()
+
+# Filled by warm_caches() before the worker reports ready
+WARMUP_BOOKS = 20
+WARMUP_CATALOG_PAGES = 3
+
+# (version, serialized GET /books/<id> body) of the books preloaded by
+# warm_caches() only; bounded by size since bodies carry the full text
+BOOK_BODY_CACHE_BYTES = 32 * 1024 * 1024
+book_body_cache = LRUCache(maxsize=WARMUP_BOOKS, max_bytes=BOOK_BODY_CACHE_BYTES, sizeof=lambda entry: len(entry[1]))
+
+# Largest JSON batch POST /books/bulk accepts; archives are loaded with
+# ingest_books.py, which runs outside the web workers and can resume
+MAX_BULK_BOOKS = 100
+
+# Compressed offline bundles, keyed by book version so updates never hit a stale entry
+bundle_cache = LRUCache(maxsize=16, ttl=600)
+
+def json_response(body, status=200):
+    return Response(body, status=status, mimetype='application/json')
+
+def serialize_book(book_id):
+    book = book_model.get_book_by_id(book_id)
+    if not book:
+        return None
+    return book_version(book_id, book.get('updated_at')), current_app.json.dumps({'book': book})
+
+def load_book_body(book_id):
+    cached = book_body_cache.get(book_id)
+    if cached is None:
+        entry = serialize_book(book_id)
+        return entry[1] if entry else None
+    
+    # The version lookup also sees updates and deletes made by other workers
+    version = book_model.get_version(book_id)
+    if version == cached[0]:
+        return cached[1]
+    
+    book_body_cache.invalidate(book_id)
+    entry = serialize_book(book_id) if version else None
+    if not entry:
+        return None
+    book_body_cache.set(book_id, entry)
+    return entry[1]
+
+def preload_book_body(book_id):
+    if not cover_urls_absolute():
+        return  # Cover URLs would be relative to whichever origin the client uses
+    entry = serialize_book(book_id)
+    if entry:
+        book_body_cache.set(book_id, entry)
+
+def build_bundle(book_id, version):
+    data = bundle_cache.get(version)
+    if data is None:
+        bundle = book_model.get_bundle(book_id)
+        if not bundle or bundle['version'] != version:
+            return None
+        # Fixed mtime and sorted keys give every worker byte-identical bundles,
+        # so a download resumed against another worker still lines up
+        data = gzip.compress(current_app.json.dumps(bundle).encode('utf-8'), mtime=0)
+        bundle_cache.set(version, data)
+    return data
+
+def reading_speed():
+    # From the profile claims in the access token, so no user lookup is needed
+    preferences = get_jwt().get('profile', {}).get('reading_preferences') or {}
+    return preferences.get('reading_speed', 'normal')
+
+def warm_caches():
+    """Preload the most-read books and the first catalog pages"""
+    # A snapshot left over from before a restart may be behind the database
+    snapshot = catalog_snapshot.current()
+    if snapshot is None or snapshot.change_seq != book_model.changes.committed_through():
+        catalog_snapshot.rebuild(book_model._listing_documents, book_model.changes.committed_through)
+    
+    # Facet counts are only updated incrementally; count existing books once
+    book_model.facets.ensure_built(book_model.collection, NOT_DELETED)
+    
+    for page in range(1, WARMUP_CATALOG_PAGES + 1):
+        book_model.get_all_books(page)
+    
+    most_read = reading_history_model.collection.aggregate([
+        {"$group": {"_id": "$book_id", "readers": {"$sum": 1}}},
+        {"$sort": {"readers": -1}},
+        {"$limit": WARMUP_BOOKS}
+    ])
+    for row in most_read:
+        preload_book_body(str(row["_id"]))
+
 @books_bp.route('/books', methods=['GET'])
 def get_books():
     try:
@@ -18,10 +123,62 @@ def get_books():
         author_filter = request.args.get('author', '')
         sort_by = request.args.get('sort', 'updated_at')
         
+        # Facet filters: exact genre(s), comma-separated, and exact author
+        genres = [genre.strip() for genre in request.args.get('genre', '').split(',') if genre.strip()]
+        author_exact = request.args.get('author_exact', '')
+        
         # Get books
-        result = book_model.get_all_books(page, limit, search, author_filter, sort_by)
+        key = ('books', page, limit, search, author_filter, sort_by, tuple(sorted(genres)), author_exact)
+        body = book_loads.do(key, lambda: current_app.json.dumps(book_model.get_all_books(
+            page, limit, search, author_filter, sort_by,
+            genres=genres, author_exact=author_exact
+        )))
         
-        return jsonify(result), 200
+        return json_response(body)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@books_bp.route('/books/suggest', methods=['GET'])
+def suggest_books():
+    try:
+        prefix = request.args.get('q', '')
+        limit = min(max(int(request.args.get('limit', 8)), 1), 20)
+        
+        snapshot = catalog_snapshot.current(book_model._listing_documents, book_model.changes.committed_through)
+        if snapshot is not None:
+            catalog_index.sync(snapshot)
+        else:
+            catalog_index.ensure_loaded(book_model.collection, NOT_DELETED)
+        suggestions = catalog_index.suggest(prefix, limit)
+        
+        return jsonify({'suggestions': suggestions}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@books_bp.route('/books/changes', methods=['GET'])
+def get_book_changes():
+    try:
+        try:
+            since = int(request.args.get('since', 0))
+        except ValueError:
+            return jsonify({'error': 'since must be a token returned by this endpoint'}), 400
+        limit = min(max(int(request.args.get('limit', MAX_CHANGES_PER_PAGE)), 1), MAX_CHANGES_PER_PAGE)
+        
+        return jsonify(book_model.get_changes(since, limit)), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@books_bp.route('/books/facets', methods=['GET'])
+def get_book_facets():
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        
+        facets = book_model.facets.get_facets(limit)
+        
+        return jsonify({'facets': facets}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -29,12 +186,91 @@ def get_books():
 @books_bp.route('/books/<book_id>', methods=['GET'])
 def get_book(book_id):
     try:
-        book = book_model.get_book_by_id(book_id)
+        body = book_loads.do(('book', book_id), lambda: load_book_body(book_id))
+        
+        if not body:
+            return jsonify({'error': 'Book not found'}), 404
+        
+        return json_response(body)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@books_bp.route('/books/<book_id>/bundle', methods=['GET'])
+def get_book_bundle(book_id):
+    try:
+        version = book_model.get_version(book_id)
+        
+        if not version:
+            return jsonify({'error': 'Book not found'}), 404
+        
+        # Revalidation only needs the version, not the bundle
+        if request.if_none_match.contains(version):
+            response = Response(status=304)
+            response.set_etag(version)
+            return response
+        
+        data = book_loads.do(('bundle', version), lambda: build_bundle(book_id, version))
+        
+        if not data:
+            return jsonify({'error': 'Book changed while building the bundle, please retry'}), 409
+        
+        response = Response(data, mimetype='application/gzip')
+        response.set_etag(version)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.headers['Content-Disposition'] = f'attachment; filename="{book_id}.json.gz"'
+        # Serves 206 partial content for Range requests (and If-Range resumes)
+        return response.make_conditional(request, accept_ranges=True, complete_length=len(data))
+        
+    except RequestedRangeNotSatisfiable:
+        raise
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@books_bp.route('/books/<book_id>/pages', methods=['GET'])
+def get_book_pages(book_id):
+    try:
+        start = max(int(request.args.get('start', 1)), 1)
+        count = min(max(int(request.args.get('count', 10)), 1), 100)
+        
+        result = book_model.get_pages(book_id, start, count)
+        
+        if not result:
+            return jsonify({'error': 'Book not found'}), 404
+        
+        return jsonify(result), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@books_bp.route('/books/<book_id>/search', methods=['GET'])
+def search_book(book_id):
+    try:
+        query = request.args.get('q', '').strip()
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        
+        if not query:
+            return jsonify({'error': 'q is required'}), 400
+        
+        result = book_model.search_content(book_id, query, limit)
+        
+        if result is None:
+            return jsonify({'error': 'Book not found'}), 404
+        
+        return jsonify({'query': query, **result}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@books_bp.route('/books/<book_id>/similar', methods=['GET'])
+def get_similar_books(book_id):
+    try:
+        similar = book_model.get_similar_books(book_id)
         
-        if not book:
+        if similar is None:
             return jsonify({'error': 'Book not found'}), 404
         
-        return jsonify({'book': book}), 200
+        return jsonify({'similar_books': similar}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -73,6 +309,43 @@ def add_book():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@books_bp.route('/books/bulk', methods=['POST'])
+@jwt_required()
+def add_books_bulk():
+    try:
+        if request.files:
+            return jsonify({'error': 'Archives must be loaded with ingest_books.py'}), 400
+        
+        data = request.get_json(silent=True)
+        records = data.get('books') if isinstance(data, dict) else None
+        if not isinstance(records, list) or not records:
+            return jsonify({'error': 'books must be a non-empty list'}), 400
+        
+        if len(records) > MAX_BULK_BOOKS:
+            return jsonify({'error': f'At most {MAX_BULK_BOOKS} books can be added per request'}), 413
+        
+        summary = {"inserted": 0, "duplicates": 0, "errors": []}
+        prepared = []
+        for index, record in enumerate(records):
+            try:
+                prepared.append(prepare_record(record))
+            except ValueError as e:
+                summary["errors"].append(f"books[{index}]: {str(e)}")
+        
+        result = book_model.add_books(prepared)
+        summary["inserted"] = len(result["inserted_ids"])
+        summary["book_ids"] = result["inserted_ids"]
+        summary["duplicates"] = result["duplicates"]
+        summary["errors"].extend(result["errors"])
+        
+        return jsonify({
+            'message': f"{summary['inserted']} book(s) added",
+            **summary
+        }), 201 if summary['inserted'] or not summary['errors'] else 400
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @books_bp.route('/books/<book_id>', methods=['PUT'])
 @jwt_required()
 def update_book(book_id):
@@ -80,11 +353,12 @@ def update_book(book_id):
         data = request.get_json()
         
         # Remove fields that shouldn't be updated
-        protected_fields = ['_id', 'created_at']
+        protected_fields = ['_id', 'created_at', 'change_seq', 'deleted']
         for field in protected_fields:
             data.pop(field, None)
         
         success = book_model.update_book(book_id, data)
+        book_body_cache.invalidate(book_id)
         
         if not success:
             return jsonify({'error': 'Failed to update book or book not found'}), 400
@@ -99,6 +373,9 @@ def update_book(book_id):
 def delete_book(book_id):
     try:
         success = book_model.delete_book(book_id)
+        book_body_cache.invalidate(book_id)
+        if success:
+            reading_history_model.remove_book(book_id)
         
         if not success:
             return jsonify({'error': 'Failed to delete book or book not found'}), 400
@@ -110,10 +387,9 @@ def delete_book(book_id):
 
 @books_bp.route('/books/<book_id>/progress', methods=['POST'])
 @jwt_required()
-def update_reading_progress():
+def update_reading_progress(book_id):
     try:
         user_id = get_jwt_identity()
-        book_id = request.view_args['book_id']
         data = request.get_json()
         
         current_page = data.get('current_page', 1)
@@ -126,7 +402,8 @@ def update_reading_progress():
         
         return jsonify({
             'message': 'Reading progress updated successfully',
-            'history_id': history_id
+            'history_id': history_id,
+            'estimate': book_model.get_reading_estimate(book_id, current_page, total_pages, reading_speed())
         }), 200
         
     except Exception as e:
@@ -138,7 +415,16 @@ def get_reading_progress(book_id):
     try:
         user_id = get_jwt_identity()
         
-        progress = reading_history_model.get_book_progress(user_id, book_id)
+        # Archived progress is read by default, so a returning reader resumes
+        # where they left off instead of overwriting it with page 1
+        include_archived = request.args.get('include_archived', 'true').lower() == 'true'
+        
+        progress = reading_history_model.get_book_progress(user_id, book_id, include_archived)
+        
+        if progress:
+            progress['estimate'] = book_model.get_reading_estimate(
+                book_id, progress.get('current_page', 1), progress.get('total_pages', 1), reading_speed()
+            )
         
         return jsonify({'progress': progress}), 200
         
@@ -0,0 +1,36 @@
+from flask import Blueprint, request, jsonify, make_response
+from models.cover import CoverStore, THUMBNAIL_SIZES
+from utils.database import db
+
+covers_bp = Blueprint('covers', __name__)
+cover_store = CoverStore(db)
+
+# Covers are content-addressed, so a given URL never changes
+COVER_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+@covers_bp.route('/covers/<cover_id>', methods=['GET'])
+def get_cover(cover_id):
+    try:
+        size = request.args.get('size', 'original')
+        if size != 'original' and size not in THUMBNAIL_SIZES:
+            return jsonify({'error': f'size must be one of: original, {", ".join(THUMBNAIL_SIZES)}'}), 400
+        
+        # The hash is the ETag, so revalidation never needs to read the file
+        if request.if_none_match.contains(f'{cover_id}:{size}'):
+            response = make_response('', 304)
+        else:
+            cover = cover_store.get_cover(cover_id, size)
+            
+            if not cover:
+                return jsonify({'error': 'Cover not found'}), 404
+            
+            data, content_type = cover
+            response = make_response(data)
+            response.headers['Content-Type'] = content_type
+        
+        response.set_etag(f'{cover_id}:{size}')
+        response.headers['Cache-Control'] = COVER_CACHE_CONTROL
+        return response
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
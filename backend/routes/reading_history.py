@@ -15,9 +15,10 @@ def get_reading_history():
         # Get query parameters
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 10))
+        include_archived = request.args.get('include_archived', 'false').lower() == 'true'
         
         # Get reading history
-        result = reading_history_model.get_user_reading_history(user_id, page, limit)
+        result = reading_history_model.get_user_reading_history(user_id, page, limit, include_archived)
         
         return jsonify(result), 200
         
@@ -30,10 +31,47 @@ def get_reading_stats():
     try:
         user_id = get_jwt_identity()
         
+        include_archived = request.args.get('include_archived', 'false').lower() == 'true'
+        
         # Get reading statistics
-        stats = reading_history_model.get_reading_stats(user_id)
+        stats = reading_history_model.get_reading_stats(user_id, include_archived)
+        activity = reading_history_model.events.get_daily_activity(user_id, days=1)
+        stats['current_streak'] = activity['current_streak']
+        stats['longest_streak'] = activity['longest_streak']
         
         return jsonify({'stats': stats}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@history_bp.route('/stats/daily', methods=['GET'])
+@jwt_required()
+def get_daily_activity():
+    try:
+        user_id = get_jwt_identity()
+        
+        days = min(max(int(request.args.get('days', 30)), 1), 365)
+        
+        # Daily pages/minutes read and streaks, from the rollup job's output
+        activity = reading_history_model.events.get_daily_activity(user_id, days)
+        
+        return jsonify(activity), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@history_bp.route('/continue-reading', methods=['GET'])
+@jwt_required()
+def get_continue_reading():
+    try:
+        user_id = get_jwt_identity()
+        
+        limit = min(max(int(request.args.get('limit', 5)), 1), 20)
+        include_completed = request.args.get('include_completed', 'false').lower() == 'true'
+        
+        books = reading_history_model.get_continue_reading(user_id, limit, include_completed)
+        
+        return jsonify({'books': books}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+from flask import g, jsonify, request
+
+class EndpointClass:
+    """A group of endpoints sharing a per-worker concurrency limit.
+
+    A request waits at most `max_wait` seconds for a slot, and is shed
+    outright if it already spent more than `deadline` seconds queued in
+    front of the worker (from the X-Request-Start header, when present).
+    With `shared`, a request also needs a slot of that semaphore, which
+    caps several classes together.
+    """
+
+    def __init__(self, name, max_concurrent, max_wait, deadline, status=503, retry_after=1, shared=None):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self.deadline = deadline
+        self.status = status
+        self.retry_after = retry_after
+        self.semaphores = [threading.BoundedSemaphore(max_concurrent)]
+        if shared is not None:
+            self.semaphores.append(shared)
+
+# Threads per gunicorn worker; the same variable sets --threads (render.yaml,
+# gunicorn_config.py), so limits follow the real thread count
+WORKER_THREADS = max(int(os.getenv('WEB_THREADS', 2)), 1)
+
+# Every class except "interactive" also takes a slot from this shared pool,
+# which is one smaller than the thread count, so a thread is always left for
+# catalog and book reads (with a single thread, nothing can be reserved)
+BACKGROUND_SLOTS = max(WORKER_THREADS - 1, 1)
+background = threading.BoundedSemaphore(BACKGROUND_SLOTS)
+
+ENDPOINT_CLASSES = {
+    "interactive": EndpointClass("interactive", max_concurrent=WORKER_THREADS, max_wait=5, deadline=10),
+    "auth": EndpointClass("auth", max_concurrent=BACKGROUND_SLOTS, max_wait=2, deadline=5, retry_after=2,
+                          shared=background),
+    "write": EndpointClass("write", max_concurrent=BACKGROUND_SLOTS, max_wait=2, deadline=5, retry_after=2,
+                           shared=background),
+    "analytics": EndpointClass("analytics", max_concurrent=1, max_wait=0.5, deadline=2, retry_after=5,
+                               shared=background),
+    "deferrable": EndpointClass("deferrable", max_concurrent=1, max_wait=0, deadline=1, status=429, retry_after=2,
+                                shared=background),
+    "bulk": EndpointClass("bulk", max_concurrent=1, max_wait=0, deadline=5, status=429, retry_after=30,
+                          shared=background)
+}
+
+# Flask endpoint name -> class; anything not listed is "interactive"
+ENDPOINT_ASSIGNMENTS = {
+    "auth.register": "auth",
+    "auth.login": "auth",
+    "auth.update_profile": "write",
+    "books.add_book": "write",
+    "books.update_book": "write",
+    "books.delete_book": "write",
+    "books.add_books_bulk": "bulk",
+    "books.update_reading_progress": "deferrable",
+    "history.get_reading_history": "analytics",
+    "history.get_reading_stats": "analytics"
+}
+
+DEFAULT_CLASS = "interactive"
+
+# Health checks must answer even when every slot is busy
+EXEMPT_ENDPOINTS = {"health_check", "liveness_check", "readiness_check"}
+
+class AdmissionController:
+    def __init__(self, classes=ENDPOINT_CLASSES, assignments=ENDPOINT_ASSIGNMENTS, default_class=DEFAULT_CLASS):
+        self.classes = classes
+        self.assignments = assignments
+        self.default_class = default_class
+
+    def init_app(self, app):
+        if os.getenv('ADMISSION_CONTROL', 'on').lower() == 'off':
+            return
+        app.before_request(self._admit)
+        app.teardown_request(self._release)
+
+    def classify(self, endpoint):
+        return self.classes[self.assignments.get(endpoint, self.default_class)]
+
+    def _admit(self):
+        if request.method == 'OPTIONS' or request.endpoint is None or request.endpoint in EXEMPT_ENDPOINTS:
+            return None
+
+        endpoint_class = self.classify(request.endpoint)
+
+        queued_for = self._queue_time()
+        if queued_for is not None and queued_for > endpoint_class.deadline:
+            return self._reject(endpoint_class)
+
+        # max_wait covers waiting for all of the class's semaphores together
+        wait_until = time.monotonic() + endpoint_class.max_wait
+        acquired = []
+        for slots in endpoint_class.semaphores:
+            if endpoint_class.max_wait:
+                admitted = slots.acquire(timeout=max(wait_until - time.monotonic(), 0))
+            else:
+                admitted = slots.acquire(blocking=False)
+            if not admitted:
+                for held in acquired:
+                    held.release()
+                return self._reject(endpoint_class)
+            acquired.append(slots)
+
+        g.admission_slots = acquired
+        return None
+
+    def _release(self, error=None):
+        for slots in g.pop('admission_slots', []):
+            slots.release()
+
+    @staticmethod
+    def _queue_time():
+        # Load balancers send "t=<epoch>" in seconds, milliseconds or microseconds
+        header = request.headers.get('X-Request-Start')
+        if not header:
+            return None
+        try:
+            started = float(header.replace('t=', '').strip())
+        except ValueError:
+            return None
+        if started > 1e14:
+            started /= 1e6
+        elif started > 1e11:
+            started /= 1e3
+        return max(time.time() - started, 0)
+
+    @staticmethod
+    def _reject(endpoint_class):
+        response = jsonify({'error': 'Server is busy, please retry shortly'})
+        response.status_code = endpoint_class.status
+        response.headers['Retry-After'] = str(endpoint_class.retry_after)
+        return response
+
+admission = AdmissionController()
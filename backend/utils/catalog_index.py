@@ -0,0 +1,160 @@
+import bisect
+import re
+import threading
+import unicodedata
+
+def normalize(text):
+    """Lower-case, accent-free, punctuation-free form used for prefix matching"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text.lower()).split())
+
+class CatalogIndex:
+    """In-memory autocomplete over book titles and authors.
+
+    Keys are kept in one sorted list, so a prefix lookup is a binary search
+    followed by a short scan. Titles and authors are also indexed from each
+    later word, so "whale" suggests "Moby Dick; or, The Whale".
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._entries = []
+        self._books = {}
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._pending = None
+        self._journal = None
+        self.loaded = False
+        self.source = None
+
+    def build(self, collection, query=None):
+        books = collection.find(query or {}, {"title": 1, "author": 1})
+        self._build((book["_id"], book.get("title", ""), book.get("author", "")) for book in books)
+
+    def sync(self, snapshot):
+        """Rebuild from the shared catalog snapshot whenever it is replaced.
+
+        The snapshot is rebuilt after writes made by any worker, script or
+        instance, so this keeps every worker's suggestions current. The
+        rebuild runs in a background thread; suggestions are served from
+        the current index until the new one is swapped in.
+        """
+        with self._lock:
+            if snapshot is self.source or snapshot is self._pending:
+                return
+            self._pending = snapshot
+        threading.Thread(target=self._sync, args=(snapshot,), daemon=True).start()
+
+    def _sync(self, snapshot):
+        with self._build_lock:
+            with self._lock:
+                if self._pending is not snapshot:
+                    return  # Superseded by a newer snapshot
+                self._journal = []
+            try:
+                self._build(snapshot.titles())
+                self.source = snapshot
+            except Exception as e:
+                print(f"Error rebuilding autocomplete index: {str(e)}")
+            finally:
+                with self._lock:
+                    self._journal = None
+                    if self._pending is snapshot:
+                        self._pending = None
+
+    def _build(self, books_iter):
+        keyed = []
+        books = {}
+        for book_id, title, author in books_iter:
+            book_id = str(book_id)
+            books[book_id] = (title or "", author or "")
+            keyed.extend(self._make_entries(book_id, *books[book_id]))
+
+        keyed.sort()
+        with self._lock:
+            self._keys = [key for key, _ in keyed]
+            self._entries = [entry for _, entry in keyed]
+            self._books = books
+            self.loaded = True
+
+            # Writes made while a background rebuild ran may be newer than its source
+            for book_id, title, author in self._journal or []:
+                self._remove(book_id)
+                if title is not None:
+                    self._insert(book_id, title, author)
+
+    def ensure_loaded(self, collection, query=None):
+        if not self.loaded:
+            self.build(collection, query)
+
+    def add_book(self, book_id, title, author):
+        book_id = str(book_id)
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((book_id, title or "", author or ""))
+            if not self.loaded:
+                return
+            self._remove(book_id)
+            self._insert(book_id, title, author)
+
+    def update_book(self, book_id, title=None, author=None):
+        old_title, old_author = self._books.get(str(book_id), ("", ""))
+        self.add_book(book_id, title if title is not None else old_title,
+                      author if author is not None else old_author)
+
+    def remove_book(self, book_id):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((str(book_id), None, None))
+            self._remove(str(book_id))
+
+    def suggest(self, prefix, limit=8):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        suggestions = []
+        seen = set()
+        with self._lock:
+            index = bisect.bisect_left(self._keys, prefix)
+            while index < len(self._keys) and self._keys[index].startswith(prefix):
+                kind, text, book_id = self._entries[index]
+                index += 1
+                marker = (kind, text if kind == "author" else book_id)
+                if marker in seen:
+                    continue
+                seen.add(marker)
+                suggestion = {"type": kind, "text": text}
+                if kind == "title":
+                    suggestion["book_id"] = book_id
+                suggestions.append(suggestion)
+                if len(suggestions) == limit:
+                    break
+        return suggestions
+
+    def _insert(self, book_id, title, author):
+        self._books[book_id] = (title or "", author or "")
+        for key, entry in self._make_entries(book_id, title, author):
+            index = bisect.bisect_right(self._keys, key)
+            self._keys.insert(index, key)
+            self._entries.insert(index, entry)
+
+    def _remove(self, book_id):
+        if self._books.pop(book_id, None) is None:
+            return
+        kept = [(key, entry) for key, entry in zip(self._keys, self._entries) if entry[2] != book_id]
+        self._keys = [key for key, _ in kept]
+        self._entries = [entry for _, entry in kept]
+
+    @staticmethod
+    def _make_entries(book_id, title, author):
+        entries = []
+        for kind, text in (("title", title), ("author", author)):
+            words = normalize(text).split()
+            for start in range(len(words)):
+                entries.append((" ".join(words[start:]), (kind, text, book_id)))
+        return entries
+
+# Shared by every Book model in this process
+catalog_index = CatalogIndex()
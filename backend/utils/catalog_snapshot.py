@@ -0,0 +1,303 @@
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from array import array
+from datetime import datetime
+from bson import json_util
+
+MAGIC = b"CATSNAP2"
+
+SNAPSHOT_PATH = os.getenv(
+    'CATALOG_SNAPSHOT_PATH',
+    os.path.join(tempfile.gettempdir(), 'ereader-catalog.snapshot')
+)
+
+# How often workers check whether the snapshot file was replaced
+RELOAD_CHECK_INTERVAL = 1
+
+# Book writes are batched into one rebuild after this delay
+REBUILD_DELAY = 2
+
+# How often a worker compares its snapshot with the book change sequence, to
+# pick up writes made by scripts, other instances or before a restart
+FRESHNESS_CHECK_INTERVAL = 15
+
+# Columns kept as raw strings so filters (and autocomplete) don't decode whole records
+STRING_COLUMNS = ["_id", "title", "author", "description", "genre"]
+
+# Same orderings as Book.get_all_books: sort name -> (field, descending)
+SORT_FIELDS = {
+    "updated_at": ("updated_at", True),
+    "created_at": ("created_at", True),
+    "title": ("title", False),
+    "author": ("author", False),
+    "publication_date": ("publication_date", True)
+}
+
+DEFAULT_SORT = "updated_at"
+
+def _sort_key(value):
+    # Approximates MongoDB's cross-type ordering: null < numbers < strings < dates
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (3, value)
+    return (4, str(value))
+
+def _pad(buffer):
+    buffer.extend(b"\0" * (-len(buffer) % 8))
+
+def write_snapshot(books, path=SNAPSHOT_PATH, change_seq=None):
+    """Write an immutable snapshot of the listing documents in `books`.
+
+    The file is written next to `path` and renamed over it, so readers
+    always see either the old or the new snapshot, never a partial one.
+    `change_seq` records the book change sequence the snapshot covers.
+    """
+    books = list(books)
+    body = bytearray()
+    sections = {}
+
+    def add_section(name, data):
+        _pad(body)
+        sections[name] = [len(body), len(data)]
+        body.extend(data)
+
+    def add_strings(name, values):
+        offsets = array('Q', [0])
+        blob = bytearray()
+        for value in values:
+            blob.extend(value.encode('utf-8'))
+            offsets.append(len(blob))
+        add_section(f"{name}.offsets", offsets.tobytes())
+        add_section(f"{name}.data", blob)
+
+    for column in STRING_COLUMNS:
+        add_strings(column, [str(book.get(column) or "") for book in books])
+    add_strings("records", [json_util.dumps(book) for book in books])
+
+    for sort_name, (field, descending) in SORT_FIELDS.items():
+        order = sorted(range(len(books)), key=lambda i: _sort_key(books[i].get(field)), reverse=descending)
+        add_section(f"sort.{sort_name}", array('I', order).tobytes())
+
+    header = json.dumps({
+        "count": len(books),
+        "built_at": datetime.utcnow().isoformat(),
+        "change_seq": change_seq,
+        "sections": sections
+    }).encode('utf-8')
+    prefix = bytearray(MAGIC + struct.pack('<I', len(header)) + header)
+    _pad(prefix)
+
+    directory = os.path.dirname(path) or '.'
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.catalog-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(struct.pack('<Q', len(prefix)))
+            f.write(prefix)
+            f.write(body)
+        os.replace(temp_path, path)
+    except Exception:
+        os.unlink(temp_path)
+        raise
+
+class CatalogSnapshot:
+    """Read-only, memory-mapped view of a snapshot file.
+
+    The mapping is shared through the OS page cache, so every worker
+    process serves listings from the same physical memory.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(self._mmap)
+        body_start = 8 + struct.unpack_from('<Q', view, 0)[0]
+        if bytes(view[8:8 + len(MAGIC)]) != MAGIC:
+            raise ValueError(f'{path} is not a catalog snapshot')
+        header_length = struct.unpack_from('<I', view, 8 + len(MAGIC))[0]
+        header_start = 8 + len(MAGIC) + 4
+        header = json.loads(bytes(view[header_start:header_start + header_length]))
+
+        self.count = header["count"]
+        self.built_at = header["built_at"]
+        self.change_seq = header.get("change_seq")
+        self._sections = {
+            name: view[body_start + offset:body_start + offset + length]
+            for name, (offset, length) in header["sections"].items()
+        }
+        self._sorts = {name: self._sections[f"sort.{name}"].cast('I') for name in SORT_FIELDS}
+        self._offsets = {
+            name: self._sections[f"{name}.offsets"].cast('Q')
+            for name in STRING_COLUMNS + ["records"]
+        }
+
+    def _string(self, column, index):
+        offsets = self._offsets[column]
+        return str(self._sections[f"{column}.data"][offsets[index]:offsets[index + 1]], 'utf-8')
+
+    def record(self, index):
+        return json_util.loads(self._string("records", index))
+
+    def titles(self):
+        """(book_id, title, author) of every book"""
+        for index in range(self.count):
+            yield self._string("_id", index), self._string("title", index), self._string("author", index)
+
+    def query(self, page=1, limit=10, search="", author_filter="", sort_by=DEFAULT_SORT,
+              genres=None, author_exact=""):
+        """Same filters, ordering and result shape as Book.get_all_books"""
+        order = self._sorts.get(sort_by, self._sorts[DEFAULT_SORT])
+        skip = (page - 1) * limit
+        genres = set(genres or [])
+
+        if not search and not author_filter and not genres and not author_exact:
+            total = self.count
+            selected = order[skip:skip + limit]
+        else:
+            search_pattern = re.compile(search, re.IGNORECASE) if search else None
+            author_pattern = re.compile(author_filter, re.IGNORECASE) if author_filter else None
+
+            matches = []
+            for index in order:
+                if search_pattern and not (
+                    search_pattern.search(self._string("title", index))
+                    or search_pattern.search(self._string("description", index))
+                ):
+                    continue
+                if genres and self._string("genre", index) not in genres:
+                    continue
+                if author_pattern and not author_pattern.search(self._string("author", index)):
+                    continue
+                if author_exact and self._string("author", index) != author_exact:
+                    continue
+                matches.append(index)
+            total = len(matches)
+            selected = matches[skip:skip + limit]
+
+        books = []
+        for index in selected:
+            book = self.record(index)
+            book['_id'] = str(book['_id'])
+            books.append(book)
+
+        return {
+            "books": books,
+            "total": total,
+            "page": page,
+            "pages": (total + limit - 1) // limit
+        }
+
+class SnapshotManager:
+    """Keeps the current snapshot mapped and rebuilds it after catalog writes"""
+
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+        self._snapshot = None
+        self._identity = None
+        self._checked_at = 0
+        self._freshness_checked_at = 0
+        self._lock = threading.Lock()
+        self._rebuild_timer = None
+        self._written_seq = 0
+        self._reload_callbacks = []
+
+    def on_reload(self, callback):
+        """Call `callback(snapshot)` whenever a new snapshot is mapped"""
+        self._reload_callbacks.append(callback)
+
+    def note_write(self, change_seq):
+        """Record a book write made by this process"""
+        with self._lock:
+            self._written_seq = max(self._written_seq, change_seq)
+
+    def includes_own_writes(self, snapshot):
+        """Whether `snapshot` already has every write this process made"""
+        if not self._written_seq:
+            return True
+        return snapshot.change_seq is not None and snapshot.change_seq >= self._written_seq
+
+    def current(self, load_books=None, committed_through=None):
+        """Return the latest snapshot, or None if none has been built yet.
+
+        With `committed_through` (the book change sequence), a snapshot
+        that is behind the database is rebuilt in the background.
+        """
+        snapshot = self._load()
+        now = time.monotonic()
+        if snapshot is not None and committed_through and now - self._freshness_checked_at >= FRESHNESS_CHECK_INTERVAL:
+            self._freshness_checked_at = now
+            try:
+                if snapshot.change_seq is None or snapshot.change_seq < committed_through():
+                    self.schedule_rebuild(load_books, committed_through)
+            except Exception as e:
+                print(f"Could not check catalog snapshot freshness: {str(e)}")
+        return snapshot
+
+    def _load(self):
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return self._snapshot
+
+        reloaded = False
+        with self._lock:
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                self._snapshot = self._identity = None
+                return None
+
+            identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if identity != self._identity:
+                try:
+                    self._snapshot = CatalogSnapshot(self.path)
+                    self._identity = identity
+                    reloaded = True
+                except Exception as e:
+                    print(f"Could not load catalog snapshot: {str(e)}")
+                    self._snapshot = self._identity = None
+            snapshot = self._snapshot
+
+        if reloaded:
+            for callback in self._reload_callbacks:
+                try:
+                    callback(snapshot)
+                except Exception as e:
+                    print(f"Error handling catalog snapshot reload: {str(e)}")
+        return snapshot
+
+    def rebuild(self, load_books, committed_through=None):
+        # Read the sequence first: the books loaded after it are at least that new
+        change_seq = committed_through() if committed_through else None
+        write_snapshot(load_books(), self.path, change_seq)
+        self._checked_at = 0
+
+    def schedule_rebuild(self, load_books, committed_through=None):
+        """Rebuild in the background, coalescing writes made within REBUILD_DELAY"""
+        with self._lock:
+            if self._rebuild_timer is not None:
+                return
+            self._rebuild_timer = threading.Timer(REBUILD_DELAY, self._run_rebuild, [load_books, committed_through])
+            self._rebuild_timer.daemon = True
+            self._rebuild_timer.start()
+
+    def _run_rebuild(self, load_books, committed_through):
+        with self._lock:
+            self._rebuild_timer = None
+        try:
+            self.rebuild(load_books, committed_through)
+        except Exception as e:
+            print(f"Error rebuilding catalog snapshot: {str(e)}")
+
+catalog_snapshot = SnapshotManager()
@@ -1,4 +1,5 @@
 from pymongo import MongoClient
+from pymongo.errors import CollectionInvalid
 import os
 from dotenv import load_dotenv
 
@@ -55,11 +56,46 @@ class Database:
         self._db.books.create_index("author")
         self._db.books.create_index("updated_at")
         self._db.books.create_index("created_at")
+        self._db.books.create_index("source_key", unique=True, sparse=True)
+        self._db.books.create_index("genre")
+        self._db.books.create_index("change_seq")
+        self._db.books.create_index([("deleted", 1), ("deleted_at", 1)], sparse=True)
+        
+        # Materialized facet counts
+        self._db.book_facets.create_index([("field", 1), ("count", -1)])
+        
+        # Book content chunk and search postings indexes
+        self._db.book_content.create_index([("book_id", 1), ("first_page", 1)])
+        self._db.book_postings.create_index([("book_id", 1), ("version", 1)])
         
         # Reading history indexes
         self._db.reading_history.create_index([("user_id", 1), ("book_id", 1)], unique=True)
         self._db.reading_history.create_index("user_id")
         self._db.reading_history.create_index("last_read")
+        self._db.reading_history_archive.create_index([("user_id", 1), ("book_id", 1)], unique=True)
+        self._db.reading_history_archive.create_index([("user_id", 1), ("last_read", -1)])
+        self._db.reading_history.create_index([("user_id", 1), ("last_read", -1)])
+        self._db.recent_reads.create_index("items.book_id")
+        
+        # Reading events (time series) and daily rollups
+        try:
+            self._db.create_collection(
+                "reading_events",
+                timeseries={"timeField": "ts", "metaField": "meta", "granularity": "minutes"}
+            )
+        except CollectionInvalid:
+            pass  # Already exists
+        self._db.reading_rollups.create_index([("user_id", 1), ("day", 1)], unique=True)
+    
+    def ping(self):
+        """Return True if the MongoDB server currently answers"""
+        if self._client is None:
+            return False
+        try:
+            self._client.admin.command('ping')
+            return True
+        except Exception:
+            return False
     
     def close(self):
         if self._client:
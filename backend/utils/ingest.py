@@ -0,0 +1,275 @@
+import json
+import os
+import posixpath
+import re
+import tarfile
+import tempfile
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from html.parser import HTMLParser
+from models.book_content import BookContent, text_stats
+
+SUPPORTED_EXTENSIONS = ('.txt', '.epub', '.json')
+
+# Files parsed ahead of the database writes, per worker process; bounds the
+# prepared books held in memory when inserts are slower than parsing
+FILES_IN_FLIGHT_PER_WORKER = 4
+
+# Project Gutenberg style headers ("Title: ...") read from the top of .txt files
+TEXT_HEADER_FIELDS = {"title": "title", "author": "author", "subject": "genre"}
+TEXT_HEADER_LINES = 40
+
+EPUB_NAMESPACES = {
+    "container": "urn:oasis:names:tc:opendocument:xmlns:container",
+    "opf": "http://www.idpf.org/2007/opf",
+    "dc": "http://purl.org/dc/elements/1.1/"
+}
+
+class _TextExtractor(HTMLParser):
+    """Collects the text of an XHTML document, one page per block element"""
+
+    BLOCK_TAGS = {"p", "div", "h1", "h2", "h3", "h4", "h5", "h6", "li", "blockquote", "section"}
+    SKIP_TAGS = {"script", "style", "head"}
+
+    def __init__(self):
+        super().__init__()
+        self.blocks = []
+        self._current = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._current.append(data)
+
+    def _flush(self):
+        text = " ".join("".join(self._current).split())
+        if text:
+            self.blocks.append(text)
+        self._current = []
+
+    def get_text(self):
+        self._flush()
+        return "\n\n".join(self.blocks)
+
+def parse_text(path):
+    with open(path, encoding='utf-8', errors='replace') as f:
+        content = f.read().replace('\r\n', '\n').strip()
+
+    record = {"title": _title_from_filename(path), "author": "Unknown"}
+    for line in content.split('\n', TEXT_HEADER_LINES)[:TEXT_HEADER_LINES]:
+        header, sep, value = line.partition(':')
+        field = TEXT_HEADER_FIELDS.get(header.strip().lower())
+        if sep and field and value.strip():
+            record[field] = value.strip()
+
+    record["content"] = content
+    return [record]
+
+def parse_epub(path):
+    with zipfile.ZipFile(path) as epub:
+        container = ET.fromstring(epub.read("META-INF/container.xml"))
+        rootfile = container.find(".//container:rootfile", EPUB_NAMESPACES)
+        opf_path = rootfile.get("full-path")
+        opf = ET.fromstring(epub.read(opf_path))
+        opf_dir = posixpath.dirname(opf_path)
+
+        def metadata(tag):
+            element = opf.find(f".//dc:{tag}", EPUB_NAMESPACES)
+            return element.text.strip() if element is not None and element.text else ""
+
+        manifest = {
+            item.get("id"): item.get("href")
+            for item in opf.findall(".//opf:manifest/opf:item", EPUB_NAMESPACES)
+        }
+
+        sections = []
+        for itemref in opf.findall(".//opf:spine/opf:itemref", EPUB_NAMESPACES):
+            href = manifest.get(itemref.get("idref"))
+            if not href:
+                continue
+            extractor = _TextExtractor()
+            extractor.feed(epub.read(posixpath.join(opf_dir, href)).decode('utf-8', errors='replace'))
+            text = extractor.get_text()
+            if text:
+                sections.append(text)
+
+    return [{
+        "title": metadata("title") or _title_from_filename(path),
+        "author": metadata("creator") or "Unknown",
+        "description": _strip_html(metadata("description")),
+        "genre": metadata("subject"),
+        "content": "\n\n".join(sections)
+    }]
+
+def parse_json(path):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else [data]
+
+PARSERS = {
+    ".txt": parse_text,
+    ".epub": parse_epub,
+    ".json": parse_json
+}
+
+def prepare_record(record, source_key=None):
+    """Validate a parsed book and pre-build its compressed content chunks.
+
+    This is the CPU-heavy part of ingestion and runs in worker processes.
+    """
+    for field in ('title', 'author', 'content'):
+        if not record.get(field):
+            raise ValueError(f'{field} is required')
+
+    content = record['content']
+    prepared = {
+        "title": record['title'],
+        "author": record['author'],
+        "description": record.get('description', ''),
+        "cover_image": record.get('cover_image', ''),
+        "genre": record.get('genre', ''),
+        "publication_date": record.get('publication_date'),
+        "content_size": len(content.encode('utf-8')),
+        "chunks": BookContent.build_chunks(content),
+        "postings": BookContent.build_postings(content),
+        "text_stats": text_stats(content)
+    }
+    if source_key:
+        prepared["source_key"] = source_key
+    return prepared
+
+def prepare_file(path, root):
+    """Parse one source file into prepared books; errors are returned, not raised"""
+    relative_path = os.path.relpath(path, root)
+    try:
+        records = PARSERS[os.path.splitext(path)[1].lower()](path)
+    except Exception as e:
+        return relative_path, [], [f"{relative_path}: {str(e)}"]
+
+    books, errors = [], []
+    for index, record in enumerate(records):
+        source_key = f"{relative_path}#{index}"
+        try:
+            books.append(prepare_record(record, source_key))
+        except Exception as e:
+            errors.append(f"{source_key}: {str(e)}")
+    return relative_path, books, errors
+
+def find_source_files(root):
+    paths = []
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                paths.append(os.path.join(directory, filename))
+    return sorted(paths)
+
+def extract_archive(path, destination):
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            archive.extractall(destination)
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path) as archive:
+            for member in archive.getmembers():
+                if member.name.startswith('/') or '..' in member.name.split('/') or not (member.isfile() or member.isdir()):
+                    raise ValueError(f'Unsafe archive member: {member.name}')
+            archive.extractall(destination)
+    else:
+        raise ValueError(f'Unsupported archive: {path}')
+
+def ingest_path(book_model, path, workers=None, batch_size=500, progress_file=None, report=print):
+    """Ingest every supported book under a directory or inside an archive.
+
+    Source files listed in `progress_file` are skipped, and each file is
+    appended to it once all of its books are written, so an interrupted
+    run can simply be started again.
+    """
+    if os.path.isdir(path):
+        return _ingest_directory(book_model, path, workers, batch_size, progress_file, report)
+
+    with tempfile.TemporaryDirectory() as directory:
+        extract_archive(path, directory)
+        return _ingest_directory(book_model, directory, workers, batch_size, progress_file, report)
+
+def _ingest_directory(book_model, root, workers, batch_size, progress_file, report):
+    done = set()
+    if progress_file and os.path.exists(progress_file):
+        with open(progress_file, encoding='utf-8') as f:
+            done = {line.rstrip('\n') for line in f if line.strip()}
+
+    paths = [p for p in find_source_files(root) if os.path.relpath(p, root) not in done]
+    summary = {"files": len(paths), "skipped_files": len(done), "inserted": 0, "duplicates": 0, "errors": []}
+    report(f"Ingesting {len(paths)} file(s), {len(done)} already done")
+
+    started = time.time()
+    batch, batch_files = [], []
+    processed = 0
+
+    def flush():
+        if not batch_files:
+            return
+        if batch:
+            result = book_model.add_books(batch)
+            summary["inserted"] += len(result["inserted_ids"])
+            summary["duplicates"] += result["duplicates"]
+            summary["errors"].extend(result["errors"])
+        if progress_file:
+            with open(progress_file, 'a', encoding='utf-8') as f:
+                f.writelines(f"{name}\n" for name in batch_files)
+        batch.clear()
+        batch_files.clear()
+
+        elapsed = time.time() - started
+        rate = processed / elapsed if elapsed else 0
+        remaining = (len(paths) - processed) / rate if rate else 0
+        report(
+            f"{processed}/{len(paths)} files, {summary['inserted']} books inserted "
+            f"({rate:.1f} files/s, ~{remaining:.0f}s remaining)"
+        )
+
+    max_in_flight = (workers or os.cpu_count() or 1) * FILES_IN_FLIGHT_PER_WORKER
+    remaining_paths = iter(paths)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        while True:
+            for path in remaining_paths:
+                in_flight.add(executor.submit(prepare_file, path, root))
+                if len(in_flight) >= max_in_flight:
+                    break
+            if not in_flight:
+                break
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                relative_path, books, errors = future.result()
+                processed += 1
+                summary["errors"].extend(errors)
+                batch.extend(books)
+                batch_files.append(relative_path)
+                if len(batch) >= batch_size:
+                    flush()
+        flush()
+
+    return summary
+
+def _title_from_filename(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r'[_\-]+', ' ', name).strip().title()
+
+def _strip_html(text):
+    extractor = _TextExtractor()
+    extractor.feed(text)
+    return extractor.get_text().replace('\n\n', ' ')
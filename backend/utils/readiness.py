@@ -0,0 +1,42 @@
+import threading
+import time
+from datetime import datetime
+
+class Readiness:
+    """Tracks a worker's warm-up, run once in the background at startup"""
+
+    def __init__(self):
+        self.state = "starting"
+        self.ready_at = None
+        self.steps = {}
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def warm_up(self, app, steps):
+        """Run (name, fn) steps in a background app context, then report ready.
+
+        Warm-up is best effort: a failed step is recorded, not retried.
+        """
+        thread = threading.Thread(target=self._run, args=(app, steps), daemon=True)
+        thread.start()
+
+    def _run(self, app, steps):
+        self.state = "warming"
+        with app.app_context():
+            self._run_steps(steps)
+        self.state = "ready"
+        self.ready_at = datetime.utcnow().isoformat()
+
+    def _run_steps(self, steps):
+        for name, fn in steps:
+            started = time.monotonic()
+            try:
+                fn()
+                self.steps[name] = {"status": "done", "seconds": round(time.monotonic() - started, 3)}
+            except Exception as e:
+                print(f"Warm-up step '{name}' failed: {str(e)}")
+                self.steps[name] = {"status": "failed", "error": str(e)}
+
+readiness = Readiness()
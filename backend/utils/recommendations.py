@@ -0,0 +1,106 @@
+import zlib
+import numpy as np
+from scipy import sparse
+from utils.text import tokenize
+
+# Words are hashed into a fixed feature space, so no vocabulary is kept
+N_FEATURES = 2 ** 18
+
+# Only a book's strongest terms are kept; bounds the matrix at N x this
+MAX_TERMS_PER_BOOK = 100
+
+# Field text is repeated this many times before counting terms
+FIELD_WEIGHTS = {"title": 3, "genre": 2, "description": 1, "content": 1}
+
+def hash_terms(document):
+    """Hashed term counts of a {field: text} document, as (indices, counts)"""
+    counts = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(document.get(field) or ""):
+            feature = zlib.crc32(token.encode('utf-8')) % N_FEATURES
+            counts[feature] = counts.get(feature, 0) + weight
+    indices = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    return indices, values
+
+def document_frequencies(documents):
+    """First pass: number of documents each hashed term appears in"""
+    df = np.zeros(N_FEATURES, dtype=np.int32)
+    count = 0
+    for document in documents:
+        indices, _ = hash_terms(document)
+        df[indices] += 1
+        count += 1
+    return df, count
+
+def inverse_document_frequencies(df, count):
+    return (np.log((1 + count) / (1 + df)) + 1).astype(np.float32)
+
+def vectorize(document, idf):
+    """Sparse, L2-normalized TF-IDF vector keeping the top MAX_TERMS_PER_BOOK terms"""
+    indices, counts = hash_terms(document)
+    weights = (1 + np.log(counts)) * idf[indices]
+
+    if len(weights) > MAX_TERMS_PER_BOOK:
+        keep = np.argpartition(-weights, MAX_TERMS_PER_BOOK)[:MAX_TERMS_PER_BOOK]
+        indices, weights = indices[keep], weights[keep]
+
+    norm = np.linalg.norm(weights)
+    if norm:
+        weights = weights / norm
+    order = np.argsort(indices)
+    return indices[order], weights[order].astype(np.float32)
+
+def build_matrix(vectors):
+    """Stack (indices, weights) vectors into a CSR matrix, one row per book"""
+    indptr = np.zeros(len(vectors) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(indices) for indices, _ in vectors])
+    if vectors:
+        indices = np.concatenate([indices for indices, _ in vectors])
+        data = np.concatenate([weights for _, weights in vectors])
+    else:
+        indices = np.zeros(0, dtype=np.int32)
+        data = np.zeros(0, dtype=np.float32)
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(vectors), N_FEATURES))
+
+def top_k_similar(queries, corpus, k, memory_budget, exclude_self_offset=None):
+    """Yield (query_row, [(corpus_row, score), ...]) with the k most similar corpus rows.
+
+    Cosine similarities are computed for blocks of query rows at a time,
+    sized so one dense block of scores stays within `memory_budget` bytes.
+    With `exclude_self_offset`, query row i is corpus row i + offset and is
+    never returned as its own neighbor.
+    """
+    n_corpus = corpus.shape[0]
+    if n_corpus == 0:
+        return
+
+    corpus_t = corpus.T.tocsc()
+    block_rows = max(1, memory_budget // (n_corpus * 4 * 3))
+    k = min(k, n_corpus - (1 if exclude_self_offset is not None else 0))
+    if k <= 0:
+        return
+
+    for start in range(0, queries.shape[0], block_rows):
+        end = min(start + block_rows, queries.shape[0])
+        scores = (queries[start:end] @ corpus_t).toarray().astype(np.float32)
+
+        if exclude_self_offset is not None:
+            rows = np.arange(end - start)
+            scores[rows, rows + start + exclude_self_offset] = -1
+
+        if k < n_corpus:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.tile(np.arange(n_corpus), (end - start, 1))
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+
+        for row in range(end - start):
+            neighbors = []
+            for position in order[row]:
+                score = float(candidate_scores[row, position])
+                if score <= 0:
+                    break
+                neighbors.append((int(candidates[row, position]), score))
+            yield start + row, neighbors
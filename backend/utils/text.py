@@ -0,0 +1,47 @@
+import html
+import re
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Tokens shorter than this are not indexed or searched
+MIN_TOKEN_LENGTH = 2
+
+SNIPPET_RADIUS = 80
+
+def tokenize(text):
+    """Lower-cased word tokens of `text`, in order"""
+    return [
+        token for token in WORD_PATTERN.findall(text.lower())
+        if len(token) >= MIN_TOKEN_LENGTH
+    ]
+
+def highlight(text, terms, radius=SNIPPET_RADIUS):
+    """Return an HTML-escaped snippet around the first match with <mark> tags,
+    and the number of matches in `text`, or (None, 0) when nothing matches."""
+    pattern = re.compile(
+        r"\b(" + "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)) + r")\b",
+        re.IGNORECASE
+    )
+    matches = list(pattern.finditer(text))
+    if not matches:
+        return None, 0
+
+    start = max(matches[0].start() - radius, 0)
+    end = min(matches[0].end() + radius, len(text))
+
+    parts = []
+    position = start
+    for match in matches:
+        if match.start() >= end:
+            break
+        parts.append(html.escape(text[position:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group(0))}</mark>")
+        position = match.end()
+    parts.append(html.escape(text[position:end]))
+
+    snippet = "".join(parts)
+    if start > 0:
+        snippet = "…" + snippet
+    if end < len(text):
+        snippet += "…"
+    return snippet, len(matches)
@@ -38,6 +38,7 @@ const NavigationControls = ({
   onPageChange,
   progressPercentage,
   calculateReadingTime,
+  minutesRemaining,
   theme
 }) => (
   <Box sx={{ 
@@ -103,6 +104,7 @@ const NavigationControls = ({
       <Box display="flex" justifyContent="space-between" alignItems="center">
         <Typography variant="caption" color="text.secondary">
           {progressPercentage.toFixed(1)}% • {calculateReadingTime()}
+          {minutesRemaining != null && ` • ${Math.ceil(minutesRemaining)} min left`}
         </Typography>
         <Typography variant="body2">
           Page {currentPage} of {totalPages}
@@ -126,6 +128,7 @@ const BookReader = () => {
   const [fontSize, setFontSize] = useState(16);
   const [theme, setTheme] = useState('light');
   const [progress, setProgress] = useState(null);
+  const [estimate, setEstimate] = useState(null);
 
   useEffect(() => {
     fetchBook();
@@ -200,6 +203,11 @@ const BookReader = () => {
         setProgress(response.data.progress);
       }
       
+      // Time left is computed server-side from the book's stored word counts
+      if (response.data && response.data.estimate) {
+        setEstimate(response.data.estimate);
+      }
+      
       // Notify user when they complete the book
       if (currentPage === totalPages && !progress?.completed) {
         // Only show the completion message if we haven't already
@@ -389,6 +397,7 @@ const BookReader = () => {
         onPageChange={(e, value) => handlePageJump(e, value)}
         progressPercentage={progressPercentage}
         calculateReadingTime={calculateReadingTime}
+        minutesRemaining={estimate?.minutes_remaining}
         theme={theme}
       />
 
@@ -3,6 +3,16 @@ import { authAPI } from '../services/api';
 
 const AuthContext = createContext();
 
+// Decode the JWT payload (no verification; the API verifies every request)
+const decodeToken = (token) => {
+  try {
+    const payload = token.split('.')[1].replace(/-/g, '+').replace(/_/g, '/');
+    return JSON.parse(window.atob(payload));
+  } catch (error) {
+    return null;
+  }
+};
+
 export const useAuth = () => {
   const context = useContext(AuthContext);
   if (!context) {
@@ -26,9 +36,14 @@ export const AuthProvider = ({ children }) => {
           setToken(storedToken);
           setUser(JSON.parse(storedUser));
           
-          // Verify token is still valid
-          const response = await authAPI.getProfile();
-          setUser(response.data.user);
+          // The token carries the profile; only ask the API when it has expired
+          const claims = decodeToken(storedToken);
+          if (claims && claims.exp * 1000 > Date.now()) {
+            setUser({ ...JSON.parse(storedUser), ...claims.profile });
+          } else {
+            const response = await authAPI.getProfile();
+            setUser(response.data.user);
+          }
         } catch (error) {
           // Token is invalid, clear storage
           localStorage.removeItem('token');
@@ -66,12 +81,15 @@ export const AuthProvider = ({ children }) => {
   const register = async (userData) => {
     try {
       const response = await authAPI.register(userData);
-      const { access_token, user_id } = response.data;
+      const { access_token, user: registeredUser } = response.data;
 
-      // Get user profile after registration
       localStorage.setItem('token', access_token);
-      const profileResponse = await authAPI.getProfile();
-      const userProfile = profileResponse.data.user;
+      let userProfile = registeredUser;
+      if (!userProfile) {
+        // Get user profile after registration
+        const profileResponse = await authAPI.getProfile();
+        userProfile = profileResponse.data.user;
+      }
 
       localStorage.setItem('user', JSON.stringify(userProfile));
       
@@ -97,8 +115,12 @@ export const AuthProvider = ({ children }) => {
   const updateProfile = async (profileData) => {
     try {
       const response = await authAPI.updateProfile(profileData);
-      const updatedUser = response.data.user;
+      const { user: updatedUser, access_token } = response.data;
       
+      if (access_token) {
+        localStorage.setItem('token', access_token);
+        setToken(access_token);
+      }
       localStorage.setItem('user', JSON.stringify(updatedUser));
       setUser(updatedUser);
       
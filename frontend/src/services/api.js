@@ -49,18 +49,26 @@ export const authAPI = {
 // Books API
 export const booksAPI = {
   getBooks: (params) => api.get('/books', { params }),
+  suggestBooks: (q) => api.get('/books/suggest', { params: { q } }),
+  getFacets: () => api.get('/books/facets'),
+  getBookChanges: (since) => api.get('/books/changes', { params: { since } }),
   getBook: (id) => api.get(`/books/${id}`),
+  getBookBundle: (id, etag) => api.get(`/books/${id}/bundle`, {
+    responseType: 'arraybuffer',
+    headers: etag ? { 'If-None-Match': etag } : {},
+    validateStatus: (status) => status === 200 || status === 304,
+  }),
   addBook: (bookData) => api.post('/books', bookData),
   updateBook: (id, bookData) => api.put(`/books/${id}`, bookData),
   deleteBook: (id) => api.delete(`/books/${id}`),
   updateProgress: (id, progressData) => api.post(`/books/${id}/progress`, progressData),
-  getProgress: (id) => api.get(`/books/${id}/progress`),
+  getProgress: (id) => api.get(`/books/${id}/progress`, { params: { include_archived: true } }),
 };
 
 // Reading History API
 export const historyAPI = {
   getHistory: (params) => api.get('/history', { params }),
-  getStats: () => api.get('/stats'),
+  getStats: () => api.get('/stats', { params: { include_archived: true } }),
 };
 
 // Health check